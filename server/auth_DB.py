@@ -1,17 +1,51 @@
 from fastapi import FastAPI, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import create_engine, Column, Integer, String, JSON, or_, DateTime
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, event, inspect, select, update, delete, literal, text, case, Column, Index, Integer, String, Text, JSON, or_, Date, DateTime
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine.default import NO_CACHE_KEY
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
-from datetime import datetime, timedelta
-from copy import deepcopy
+from sqlalchemy.pool import NullPool
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.sql.compiler import SQLCompiler
+from itsdangerous import TimestampSigner, BadSignature
+from datetime import date, datetime, timedelta
+from collections import OrderedDict
+import asyncio
+import threading
 import secrets
+import hashlib
+import base64
 import re
 import json
+import time
 from pydantic import BaseModel
 from typing import List, Optional
 from pathlib import Path
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 import os
+import sys
+
+# ---------- Optional orjson (faster JSON responses) ----------
+try:
+    import orjson
+    _HAS_ORJSON = True
+except Exception:
+    orjson = None
+    _HAS_ORJSON = False
+
+# JSON helpers shared with main.py and the JSON columns; stdlib when orjson is missing
+if _HAS_ORJSON:
+    def json_dumps(obj, *, sort_keys: bool = False) -> str:
+        opt = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, option=opt).decode("utf-8")
+    json_loads = orjson.loads
+else:
+    def json_dumps(obj, *, sort_keys: bool = False) -> str:
+        return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys)
+    json_loads = json.loads
 
 # ---------------------------------------------------------------------------
 # Database (SQLite local by default; Postgres on Render via DATABASE_URL)
@@ -49,22 +83,74 @@ def _normalize_db_url(raw: str) -> str:
 
 DATABASE_URL = _normalize_db_url(os.getenv("DATABASE_URL", "").strip())
 
+# Compiled-SQL cache entries per engine (SQLAlchemy default is 500)
+QUERY_CACHE_SIZE = 1200
+
 # Create engine with appropriate args
 if DATABASE_URL.startswith("sqlite:///"):
     engine = create_engine(
         DATABASE_URL,
         connect_args={"check_same_thread": False},
+        query_cache_size=QUERY_CACHE_SIZE,
+        json_serializer=json_dumps,
+        json_deserializer=json_loads,
+        future=True,
+    )
+elif os.getenv("PGBOUNCER", "").strip() == "1":
+    # Behind PgBouncer in transaction-pooling mode: let the bouncer pool and
+    # open a fresh client connection per checkout. psycopg2 never uses
+    # server-side prepared statements, so nothing else needs disabling.
+    engine = create_engine(
+        DATABASE_URL,
+        poolclass=NullPool,
+        query_cache_size=QUERY_CACHE_SIZE,
+        json_serializer=json_dumps,
+        json_deserializer=json_loads,
         future=True,
     )
 else:
-    # Postgres (Render) or any other server DB
+    # Postgres (Render) or any other server DB: keep TLS connections warm
     engine = create_engine(
         DATABASE_URL,
         pool_pre_ping=True,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "20")),
+        max_overflow=int(os.getenv("DB_POOL_OVERFLOW", "10")),
+        pool_recycle=1800,
+        pool_timeout=30,
+        query_cache_size=QUERY_CACHE_SIZE,
+        json_serializer=json_dumps,
+        json_deserializer=json_loads,
         future=True,
     )
 
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+if DATABASE_URL.startswith("sqlite:///"):
+    # WAL lets readers run alongside the writer; synchronous=NORMAL is safe
+    # under WAL and avoids an fsync per commit; mmap serves reads from the
+    # page cache (256 MiB).
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA mmap_size=268435456")
+        cur.close()
+
+# SQL_CACHE_CHECK=1 (dev only): fail loudly when an ORM/Core statement cannot
+# use the compiled-statement cache (e.g. literals baked into the SQL).
+if os.getenv("SQL_CACHE_CHECK", "").strip().lower() in {"1", "true", "yes", "on"}:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _check_statement_cache(conn, cursor, statement, parameters, context, executemany):
+        if context is None or not isinstance(context.compiled, SQLCompiler):
+            return  # raw driver SQL / DDL
+        if context.cache_hit == NO_CACHE_KEY:
+            raise AssertionError(f"SQL statement is not cacheable: {statement}")
+
+# Dialect-specific statements (e.g. the admin seed upsert) branch on this
+IS_POSTGRES = engine.dialect.name == "postgresql"
+
+# Sessions are request-scoped, so keep loaded values after commit instead of
+# re-SELECTing them on the next attribute access.
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
 Base = declarative_base()
 
 # ---------------------------------------------------------------------------
@@ -72,31 +158,115 @@ Base = declarative_base()
 # ---------------------------------------------------------------------------
 class User(Base):
     __tablename__ = "users"
+    # SQLite: never hand a deleted id to a new account (its old cookies name that id)
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, nullable=False)
     email = Column(String, unique=True, nullable=False)
-    password = Column(String, nullable=False)   # plaintext for simplicity
+    password = Column(String, nullable=False)   # scrypt hash (see hash_password)
     # Use callables for defaults to avoid shared mutable dicts
     settings = Column(JSON, default=dict)
-    achievements = Column(JSON, default=dict)
+    achievements = Column(JSON, default=dict)   # points, badges (see _achievement_columns)
+    # Streak and activity counters as native columns, so ach_event can update
+    # them with one conditional UPDATE instead of rewriting the JSON
+    streak_days = Column(Integer, nullable=False, default=0, server_default="0")
+    last_active_date = Column(Date)
+    counts_captions = Column(Integer, nullable=False, default=0, server_default="0")
+    counts_quizzes = Column(Integer, nullable=False, default=0, server_default="0")
+    counts_stories = Column(Integer, nullable=False, default=0, server_default="0")
 
 # ---------------------------------------------------------------------------
-# Persistent Sessions (DB-backed)
+# Revoked Sessions (denylist for signed session cookies)
 # ---------------------------------------------------------------------------
 class SessionRow(Base):
     __tablename__ = "sessions"
-    id = Column(String, primary_key=True, index=True)  # session_id token
+    id = Column(String, primary_key=True, index=True)  # session nonce (revoked)
     user_id = Column(Integer, index=True, nullable=False)
-    expiry = Column(DateTime, nullable=False)
+    expiry = Column(DateTime, nullable=False)          # when the token would have expired anyway
+
+    # Covers the denylist hydration / purge scans (range on expiry, read id)
+    __table_args__ = (Index("ix_sessions_expiry_id_user", "expiry", "id", "user_id"),)
+
+# ---------------------------------------------------------------------------
+# Saved Stories (one row per story; formerly a list under settings["stories"])
+# ---------------------------------------------------------------------------
+class Story(Base):
+    __tablename__ = "stories"
+    id = Column(String, primary_key=True)               # token_urlsafe(10)
+    user_id = Column(Integer, nullable=False)
+    title = Column(String, nullable=False)
+    panels = Column(JSON, nullable=False)               # 3 strings
+    images = Column(JSON, nullable=False)               # 3 image URLs
+    story = Column(Text, nullable=False, default="")
+    saved_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (Index("ix_stories_user_saved", "user_id", saved_at.desc()),)
 
 # Create all tables
 Base.metadata.create_all(bind=engine)
 
+# create_all() skips tables that already exist, so add any newer indexes too
+for _table in Base.metadata.sorted_tables:
+    for _idx in _table.indexes:
+        _idx.create(bind=engine, checkfirst=True)
+
+# ... and any newer columns on users
+_user_cols = {c["name"] for c in inspect(engine).get_columns(User.__tablename__)}
+with engine.begin() as _conn:
+    for _col in User.__table__.columns:
+        if _col.name in _user_cols:
+            continue
+        _ddl = f"ALTER TABLE {User.__tablename__} ADD COLUMN {_col.name} {_col.type.compile(engine.dialect)}"
+        if _col.server_default is not None:
+            _ddl += f" DEFAULT {_col.server_default.arg}"
+        if not _col.nullable:
+            _ddl += " NOT NULL"
+        _conn.execute(text(_ddl))
+
+# ... and AUTOINCREMENT on SQLite users tables created before it was declared.
+# SQLite can't add it in place, so the table is rebuilt once, in one transaction.
+def _sqlite_users_autoincrement():
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        row = cur.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'users'").fetchone()
+        if row is None or "AUTOINCREMENT" in (row[0] or "").upper():
+            raw.rollback()
+            return
+        cols = ", ".join(c.name for c in User.__table__.columns)
+        for idx in User.__table__.indexes:
+            cur.execute(f"DROP INDEX IF EXISTS {idx.name}")
+        cur.execute("ALTER TABLE users RENAME TO users_pre_autoinc")
+        cur.execute(str(CreateTable(User.__table__).compile(engine)))
+        for idx in User.__table__.indexes:
+            cur.execute(str(CreateIndex(idx).compile(engine)))
+        cur.execute(f"INSERT INTO users ({cols}) SELECT {cols} FROM users_pre_autoinc")
+        cur.execute("DROP TABLE users_pre_autoinc")
+        raw.commit()
+    except Exception as e:
+        raw.rollback()
+        print(f"[auth] users AUTOINCREMENT migration skipped: {type(e).__name__}: {e}", file=sys.stderr)
+    finally:
+        raw.close()
+
+if DATABASE_URL.startswith("sqlite:///"):
+    _sqlite_users_autoincrement()
+
 # ---------------------------------------------------------------------------
 # App setup
 # ---------------------------------------------------------------------------
-app = FastAPI()
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (fastapi.responses.ORJSONResponse is deprecated)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+# Shared with main.py so both apps serialize the same way
+DEFAULT_RESPONSE_CLASS = ORJSONResponse if _HAS_ORJSON else JSONResponse
+
+app = FastAPI(default_response_class=DEFAULT_RESPONSE_CLASS)
 
 # CORS: allow credentials and configurable origins for dev (include LAN IPs if needed)
 _origins_env = os.getenv("ALLOWED_ORIGINS", "")
@@ -120,9 +290,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Session TTL in minutes (persisted in DB)
+# Session TTL in minutes (enforced by the cookie signature timestamp)
 SESSION_TTL_MIN = 60 * 24  # 24h
 
+# Session cookies are signed "<user_id>:<nonce>" values, verified in-process.
+# Every worker and restart must sign with the same key, so it comes from
+# SESSION_SECRET (or JWT_SECRET). Locally a generated key is kept on disk.
+SESSION_SECRET_PATH = DEFAULT_DB_PATH.parent / "session_secret"
+
+def _session_secret() -> str:
+    secret = os.getenv("SESSION_SECRET") or os.getenv("JWT_SECRET")
+    if secret:
+        return secret
+    if IS_POSTGRES:
+        raise RuntimeError("SESSION_SECRET (or JWT_SECRET) must be set when using a hosted database")
+    try:
+        # O_EXCL: when several workers start together only one writes the key
+        fd = os.open(SESSION_SECRET_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(50):
+            secret = SESSION_SECRET_PATH.read_text(encoding="ascii").strip()
+            if secret:
+                return secret
+            time.sleep(0.02)  # another worker is still writing it
+        raise RuntimeError(f"{SESSION_SECRET_PATH} is empty; delete it or set SESSION_SECRET")
+    secret = secrets.token_urlsafe(32)
+    with os.fdopen(fd, "w", encoding="ascii") as f:
+        f.write(secret)
+    return secret
+
+SESSION_SECRET = _session_secret()
+_session_signer = TimestampSigner(SESSION_SECRET, salt="picteractive.session")
+
+# Nonces of logged-out sessions -> token expiry; hydrated from the sessions
+# table at startup and pruned together with it every SESSION_PURGE_INTERVAL_S
+_revoked_sessions: dict[str, datetime] = {}
+# User-wide revocations (account deletion): user_id -> every token issued at or
+# before this instant is void. Stored in the sessions table under "user:<id>"
+# (nonces never contain ":") with the expiry of the newest token it voids.
+_revoked_users: dict[int, datetime] = {}
+_USER_REVOKE_PREFIX = "user:"
+SESSION_PURGE_INTERVAL_S = 15 * 60
+# Each uvicorn worker keeps its own copy; re-read the table this often so a
+# logout handled by one worker reaches the others
+SESSION_DENYLIST_REFRESH_S = 30
+# SQLite only: PRAGMA optimize at startup, VACUUM + optimize this often
+SQLITE_VACUUM_INTERVAL_S = 7 * 24 * 3600
+
 # ---------------------------------------------------------------------------
 # DB dependency
 # ---------------------------------------------------------------------------
@@ -136,32 +350,175 @@ def get_db():
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
-def create_session(user_id: int, db: Session):
-    sid = secrets.token_urlsafe(24)
-    row = SessionRow(
-        id=sid,
-        user_id=user_id,
-        expiry=datetime.utcnow() + timedelta(minutes=SESSION_TTL_MIN),
-    )
-    db.add(row)
-    db.commit()
-    return sid
+def create_session(user_id: int) -> str:
+    """Return a signed session token; no DB write is needed."""
+    nonce = secrets.token_urlsafe(16)
+    return _session_signer.sign(f"{user_id}:{nonce}").decode("ascii")
+
+def _read_session(token: Optional[str]):
+    """Verify a session token. Returns (user_id, nonce, issued_at) or None."""
+    if not token:
+        return None
+    try:
+        value, issued = _session_signer.unsign(token, max_age=SESSION_TTL_MIN * 60, return_timestamp=True)
+        uid, _, nonce = value.decode("ascii").partition(":")
+        user_id = int(uid)
+    except (BadSignature, ValueError, UnicodeDecodeError):
+        return None
+    if not nonce or nonce in _revoked_sessions:
+        return None
+    issued = issued.replace(tzinfo=None)
+    cutoff = _revoked_users.get(user_id)
+    if cutoff is not None and issued <= cutoff:
+        return None
+    return user_id, nonce, issued
+
+def revoke_session(token: Optional[str], db: Session, commit: bool = True) -> None:
+    """Add a still-valid session token to the denylist.
+
+    With commit=False the denylist row is only staged in `db`, so it lands
+    in the caller's transaction.
+    """
+    info = _read_session(token)
+    if info is None:
+        return
+    user_id, nonce, issued = info
+    expiry = issued + timedelta(minutes=SESSION_TTL_MIN)
+    _revoked_sessions[nonce] = expiry
+    _user_cache_forget(nonce=nonce)
+    row = SessionRow(id=nonce, user_id=user_id, expiry=expiry)
+    if not commit:
+        db.merge(row)
+        return
+    try:
+        db.merge(row)
+        db.commit()
+    except Exception:
+        db.rollback()
+
+def revoke_user_sessions(user_id: int, db: Session, commit: bool = True) -> None:
+    """Void every session token issued to `user_id` so far, on every device.
+
+    commit=False stages the denylist row in `db` like revoke_session.
+    """
+    # the signer's timestamps are whole seconds
+    cutoff = datetime.utcnow().replace(microsecond=0)
+    _revoked_users[user_id] = cutoff
+    _user_cache_forget(user_id=user_id)
+    row = SessionRow(id=f"{_USER_REVOKE_PREFIX}{user_id}", user_id=user_id,
+                     expiry=cutoff + timedelta(minutes=SESSION_TTL_MIN))
+    if not commit:
+        db.merge(row)
+        return
+    try:
+        db.merge(row)
+        db.commit()
+    except Exception:
+        db.rollback()
+
+def current_user_id_from_cookie(request: Request) -> Optional[int]:
+    """User id of a valid session cookie, without touching the DB."""
+    info = _read_session(request.cookies.get("session_id"))
+    return info[0] if info is not None else None
 
 def current_user_from_cookie(request: Request, db: Session):
-    sid = request.cookies.get("session_id")
-    if not sid:
+    uid = current_user_id_from_cookie(request)
+    if uid is None:
         return None
-    row = db.query(SessionRow).filter(SessionRow.id == sid).first()
-    if row is None:
+    return db.get(User, uid)
+
+def _user_exists(db: Session, *where) -> bool:
+    """Existence probe that never hydrates a User row (or its JSON columns)."""
+    return db.scalar(select(literal(1)).select_from(User).where(*where).limit(1)) is not None
+
+def _user_column(db: Session, user_id: Optional[int], column):
+    """Load a single column for a user. Returns (found, value)."""
+    if user_id is None:
+        return False, None
+    row = db.execute(select(column).where(User.id == user_id)).first()
+    return (row is not None), (row[0] if row is not None else None)
+
+# Short-lived LRU of read-only user snapshots keyed by session nonce, so hot
+# reads (/api/auth/me, /api/me/*) skip the DB. Any write to a user must call
+# _user_cache_forget(user_id=...) after committing.
+USER_CACHE_MAX = 4096
+USER_CACHE_TTL_S = 30.0
+_user_cache: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+def _user_cache_get(nonce: str) -> Optional[dict]:
+    with _user_cache_lock:
+        hit = _user_cache.get(nonce)
+        if hit is None:
+            return None
+        if hit[0] < time.monotonic():
+            del _user_cache[nonce]
+            return None
+        _user_cache.move_to_end(nonce)
+        return hit[1]
+
+def _user_cache_put(nonce: str, profile: dict) -> None:
+    with _user_cache_lock:
+        _user_cache[nonce] = (time.monotonic() + USER_CACHE_TTL_S, profile)
+        _user_cache.move_to_end(nonce)
+        while len(_user_cache) > USER_CACHE_MAX:
+            _user_cache.popitem(last=False)
+
+def _user_cache_forget(*, nonce: Optional[str] = None, user_id: Optional[int] = None) -> None:
+    """Drop one session's entry, or every entry belonging to a user."""
+    with _user_cache_lock:
+        if nonce is not None:
+            _user_cache.pop(nonce, None)
+        if user_id is not None:
+            for k in [k for k, (_, p) in _user_cache.items() if p["id"] == user_id]:
+                del _user_cache[k]
+
+async def current_profile_from_cookie(request: Request) -> Optional[dict]:
+    """
+    Return a normalized {id, username, email, settings, achievements} snapshot
+    for the current session, from the cache when warm. Treat it as read-only.
+    Missing keys are persisted on the way in so the client always receives a
+    complete structure.
+
+    Cookie check and cache hits stay on the event loop; only a miss borrows a
+    worker thread (and a DB session) for the blocking load.
+    """
+    info = _read_session(request.cookies.get("session_id"))
+    if info is None:
         return None
-    if row.expiry < datetime.utcnow():
-        try:
-            db.delete(row)
+    user_id, nonce, _ = info
+    hit = _user_cache_get(nonce)
+    if hit is not None:
+        return hit
+    return await run_in_threadpool(_load_profile, user_id, nonce)
+
+def _load_profile(user_id: int, nonce: str) -> Optional[dict]:
+    with SessionLocal() as db:
+        user = db.get(User, user_id)
+        if user is None:
+            return None
+        ach_ok = _is_current(user.achievements, ACH_SCHEMA_VERSION)
+        settings_ok = _is_current(user.settings, SETTINGS_SCHEMA_VERSION)
+        if not ach_ok:
+            _store_achievements(user, _ensure_achievements_shape(user.achievements))
+        if not settings_ok:
+            user.settings = _ensure_settings_shape(user.settings)
+        if not (ach_ok and settings_ok):
             db.commit()
-        except Exception:
-            db.rollback()
-        return None
-    return db.get(User, row.user_id)
+        profile = {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "settings": _client_view(user.settings),
+            "achievements": _achievements_view(user),
+        }
+    _user_cache_put(nonce, profile)
+    return profile
+
+_FORCE_SECURE = os.getenv("COOKIE_SECURE", "").strip().lower() in {"1", "true", "yes", "on"}
+# Shared, read-only: callers only ever unpack these into set_cookie()
+_COOKIE_PARAMS_SECURE = dict(httponly=True, samesite="none", secure=True, path="/", max_age=SESSION_TTL_MIN * 60)
+_COOKIE_PARAMS_INSECURE = dict(httponly=True, samesite="lax", secure=False, path="/", max_age=SESSION_TTL_MIN * 60)
 
 def _cookie_params_for(request: Request) -> dict:
     """Decide cookie security flags based on request scheme and env.
@@ -170,20 +527,45 @@ def _cookie_params_for(request: Request) -> dict:
     - In local HTTP dev -> SameSite=Lax; not Secure
     You can force secure cookies by setting COOKIE_SECURE=true in the env.
     """
+    if _FORCE_SECURE:
+        return _COOKIE_PARAMS_SECURE
     xf_proto = (request.headers.get("x-forwarded-proto") or request.url.scheme or "").lower()
-    force_secure = (os.getenv("COOKIE_SECURE", "").strip().lower() in {"1", "true", "yes", "on"})
-    secure = force_secure or xf_proto == "https"
-    samesite = "none" if secure else "lax"
-    return dict(
-        httponly=True,
-        samesite=samesite,
-        secure=secure,
-        path="/",
-        max_age=SESSION_TTL_MIN * 60,
-    )
+    return _COOKIE_PARAMS_SECURE if xf_proto == "https" else _COOKIE_PARAMS_INSECURE
+
+_GMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@gmail\.com")
 
 def gmail_like(email: str) -> bool:
-    return bool(re.fullmatch(r"[A-Za-z0-9._%+-]+@gmail\.com", email))
+    return _GMAIL_RE.fullmatch(email) is not None
+
+# Password hashing (stdlib scrypt): "scrypt$<n>$<r>$<p>$<salt>$<hash>"
+_PW_SCHEME = "scrypt"
+_PW_N, _PW_R, _PW_P = 2 ** 14, 8, 1
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def hash_password(pw: str) -> str:
+    salt = secrets.token_bytes(16)
+    dk = hashlib.scrypt(pw.encode("utf-8"), salt=salt, n=_PW_N, r=_PW_R, p=_PW_P, dklen=32)
+    return f"{_PW_SCHEME}${_PW_N}${_PW_R}${_PW_P}${_b64(salt)}${_b64(dk)}"
+
+def _is_password_hash(stored: str) -> bool:
+    return (stored or "").startswith(_PW_SCHEME + "$")
+
+def verify_password(pw: str, stored: str) -> bool:
+    """Constant-time check of pw against a stored hash (or a legacy plaintext value)."""
+    stored = stored or ""
+    if not _is_password_hash(stored):
+        return secrets.compare_digest(pw.encode("utf-8"), stored.encode("utf-8"))
+    try:
+        _, n, r, p, salt, want = stored.split("$")
+        dk = hashlib.scrypt(pw.encode("utf-8"), salt=_unb64(salt), n=int(n), r=int(r), p=int(p), dklen=32)
+    except (ValueError, TypeError):
+        return False
+    return secrets.compare_digest(dk, _unb64(want))
 
 # Reasonable defaults per account
 DEFAULT_SETTINGS = {
@@ -208,6 +590,7 @@ DEFAULT_SETTINGS = {
     "grid_guides": False,
 }
 
+# Full achievements shape as returned to the client (see _achievements_view)
 DEFAULT_ACHIEVEMENTS = {
     "streak_days": 0,
     "last_active_at": None,            # ISO date string in UTC, e.g. "2025-10-14"
@@ -216,17 +599,43 @@ DEFAULT_ACHIEVEMENTS = {
     "badges": [],
 }
 
+# Stamped into the stored JSON as "_v" by the _ensure_*_shape helpers. A
+# stored blob carrying the current version is already normalized; bump a
+# version when its normalization rules change.
+SETTINGS_SCHEMA_VERSION = 1
+ACH_SCHEMA_VERSION = 2   # 2: streak/counts moved into User columns
+
+# Achievement events: type -> (counts key, first-time badge id, title, description)
+EVENT_BADGES = {
+    "caption": ("captions", "first_caption", "First Caption", "Generate your first caption"),
+    "quiz": ("quizzes", "quiz_whiz", "Quiz Whiz", "Complete your first quiz"),
+    "story": ("stories", "storyteller", "Storyteller", "Create your first story"),
+}
+# (min streak, badge id, title, description)
+STREAK_BADGES = [
+    (7, "streak_7", "7-Day Streak", "Use the app 7 days in a row"),
+    (30, "streak_30", "30-Day Streak", "Use the app 30 days in a row"),
+]
+
+def _is_current(blob, version: int) -> bool:
+    return isinstance(blob, dict) and blob.get("_v") == version
+
+def _client_view(blob: dict) -> dict:
+    """A stored settings/achievements dict without the internal "_v" stamp."""
+    return {k: v for k, v in blob.items() if k != "_v"}
+
 def _ensure_achievements_shape(ach: dict | str | None) -> dict:
     """Return a normalized achievements dict ensuring all expected keys exist."""
-    base = deepcopy(DEFAULT_ACHIEVEMENTS)
+    # Shallow copies are enough: "counts" and "badges" are rebuilt below
+    base = DEFAULT_ACHIEVEMENTS
     data: dict = {}
     if isinstance(ach, str):
         try:
-            data = json.loads(ach) or {}
+            data = json_loads(ach) or {}
         except Exception:
             data = {}
     elif isinstance(ach, dict):
-        data = deepcopy(ach)
+        data = ach
     # Shallow merge
     out = {**base, **(data or {})}
     # Ensure nested counts exists with all keys
@@ -242,20 +651,64 @@ def _ensure_achievements_shape(ach: dict | str | None) -> dict:
     # Coerce streak
     out["streak_days"] = int(out.get("streak_days", 0) or 0)
     # last_active_at left as string/None
+    out["_v"] = ACH_SCHEMA_VERSION
+    return out
+
+_ACH_COLUMN_KEYS = {"streak_days", "last_active_at", "counts"}
+
+def _parse_day(raw) -> Optional[date]:
+    if isinstance(raw, str):
+        try:
+            return datetime.fromisoformat(raw.replace("Z", "")).date()
+        except Exception:
+            pass
+    return None
+
+def _achievement_columns(ach: dict) -> dict:
+    """Split a normalized achievements dict into User column values."""
+    counts = ach["counts"]
+    return {
+        "achievements": {k: v for k, v in ach.items() if k not in _ACH_COLUMN_KEYS},
+        "streak_days": ach["streak_days"],
+        "last_active_date": _parse_day(ach.get("last_active_at")),
+        "counts_captions": counts["captions"],
+        "counts_quizzes": counts["quizzes"],
+        "counts_stories": counts["stories"],
+    }
+
+def _store_achievements(user: User, ach: dict) -> None:
+    for k, v in _achievement_columns(ach).items():
+        setattr(user, k, v)
+
+def _achievements_view(row) -> dict:
+    """Reassemble the client-facing achievements dict from a User (or row)."""
+    rest = row.achievements if isinstance(row.achievements, dict) else {}
+    out = {
+        "streak_days": int(row.streak_days or 0),
+        "last_active_at": row.last_active_date.isoformat() if row.last_active_date else None,
+        "points": rest.get("points", 0),
+        "counts": {
+            "captions": int(row.counts_captions or 0),
+            "quizzes": int(row.counts_quizzes or 0),
+            "stories": int(row.counts_stories or 0),
+        },
+    }
+    out.update((k, v) for k, v in rest.items() if k not in ("points", "_v"))
     return out
 
 # --- Settings normalization ---
 def _ensure_settings_shape(s: dict | str | None) -> dict:
     """Return a normalized settings dict with proper types and defaults."""
-    base = deepcopy(DEFAULT_SETTINGS)
+    # Defaults are flat scalars, so merging into a new dict needs no deepcopy
+    base = DEFAULT_SETTINGS
     data: dict = {}
     if isinstance(s, str):
         try:
-            data = json.loads(s) or {}
+            data = json_loads(s) or {}
         except Exception:
             data = {}
     elif isinstance(s, dict):
-        data = deepcopy(s)
+        data = s
 
     out = {**base, **(data or {})}
 
@@ -295,6 +748,7 @@ def _ensure_settings_shape(s: dict | str | None) -> dict:
     out["storage_path"] = str(out.get("storage_path", base["storage_path"]))
     out["word_highlight_color"] = str(out.get("word_highlight_color", base["word_highlight_color"]))
 
+    out["_v"] = SETTINGS_SCHEMA_VERSION
     return out
 
 # ---------------------------------------------------------------------------
@@ -304,33 +758,162 @@ def _ensure_settings_shape(s: dict | str | None) -> dict:
 # Seed a default admin account at startup (for demo/verification on Vercel)
 @app.on_event("startup")
 def _seed_admin_user():
+    # One INSERT ... ON CONFLICT DO NOTHING: if either username or email
+    # already exists the row is skipped, with no SELECT probe or ORM session.
+    dialect_insert = postgresql.insert if IS_POSTGRES else sqlite.insert
+    stmt = dialect_insert(User).values(
+        username="admin",
+        email="admin@example.com",
+        password=hash_password("admin1"),
+        settings=_ensure_settings_shape(DEFAULT_SETTINGS),
+        **_achievement_columns(_ensure_achievements_shape({})),
+    ).on_conflict_do_nothing()
     try:
-        db = SessionLocal()
-        # If either username or email already exists, skip seeding
-        existing = db.query(User).filter(or_(User.username == "admin", User.email == "admin@example.com")).first()
-        if existing is None:
-            demo_settings = _ensure_settings_shape(DEFAULT_SETTINGS)
-            demo_ach = _ensure_achievements_shape({})
-            user = User(
-                username="admin",
-                email="admin@example.com",
-                password="admin1",
-                settings=demo_settings,
-                achievements=demo_ach,
-            )
-            db.add(user)
-            db.commit()
-    except Exception:
+        with engine.begin() as conn:
+            conn.execute(stmt)
+    except Exception as e:
         # Best-effort seed; do not crash app if seeding fails
-        try:
-            db.rollback()
-        except Exception:
-            pass
+        print(f"[auth] admin seed skipped: {type(e).__name__}: {e}", file=sys.stderr)
+
+@app.on_event("startup")
+def _load_revoked_sessions():
+    """Hydrate the in-memory session denylist from the sessions table."""
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(SessionRow.id, SessionRow.user_id, SessionRow.expiry)
+            .where(SessionRow.expiry >= datetime.utcnow())
+        ).all()
+        ttl = timedelta(minutes=SESSION_TTL_MIN)
+        for sid, uid, exp in rows:
+            if sid.startswith(_USER_REVOKE_PREFIX):
+                _revoked_users[uid] = max(exp - ttl, _revoked_users.get(uid, exp - ttl))
+            else:
+                _revoked_sessions[sid] = exp
+    except Exception:
+        pass
     finally:
-        try:
-            db.close()
-        except Exception:
-            pass
+        db.close()
+
+@app.on_event("startup")
+def _migrate_settings_stories():
+    """One-shot move of legacy settings["stories"] lists into the stories table."""
+    db = SessionLocal()
+    try:
+        for uid, settings in db.execute(select(User.id, User.settings)).all():
+            if not isinstance(settings, dict) or "stories" not in settings:
+                continue
+            for st in settings.get("stories") or []:
+                if not isinstance(st, dict) or not st.get("id"):
+                    continue
+                try:
+                    saved_at = datetime.fromisoformat(str(st.get("saved_at") or "").replace("Z", ""))
+                except ValueError:
+                    saved_at = datetime.utcnow()
+                db.merge(Story(
+                    id=str(st["id"]),
+                    user_id=uid,
+                    title=str(st.get("title") or "Untitled Story"),
+                    panels=list(st.get("panels") or []),
+                    images=list(st.get("images") or []),
+                    story=str(st.get("story") or ""),
+                    saved_at=saved_at,
+                ))
+            rest = {k: v for k, v in settings.items() if k != "stories"}
+            db.execute(update(User).where(User.id == uid).values(settings=rest))
+        db.commit()
+    except Exception:
+        db.rollback()
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def _hash_legacy_passwords():
+    """One-shot upgrade of plaintext passwords (pre-hashing rows) to scrypt hashes."""
+    db = SessionLocal()
+    try:
+        for uid, pw in db.execute(select(User.id, User.password)).all():
+            if not _is_password_hash(pw):
+                db.execute(update(User).where(User.id == uid).values(password=hash_password(pw or "")))
+        db.commit()
+    except Exception:
+        db.rollback()
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def _migrate_achievement_columns():
+    """One-shot move of streak/counts out of older achievements JSON into User columns."""
+    db = SessionLocal()
+    try:
+        for uid, ach in db.execute(select(User.id, User.achievements)).all():
+            if not _is_current(ach, ACH_SCHEMA_VERSION):
+                cols = _achievement_columns(_ensure_achievements_shape(ach))
+                db.execute(update(User).where(User.id == uid).values(**cols))
+        db.commit()
+    except Exception:
+        db.rollback()
+    finally:
+        db.close()
+
+def purge_expired_sessions() -> None:
+    """Bulk-delete denylist entries whose tokens have expired on their own."""
+    now = datetime.utcnow()
+    for sid, exp in list(_revoked_sessions.items()):
+        if exp < now:
+            _revoked_sessions.pop(sid, None)
+    oldest_live = now - timedelta(minutes=SESSION_TTL_MIN)
+    for uid, cutoff in list(_revoked_users.items()):
+        if cutoff < oldest_live:  # every token it voided has expired anyway
+            _revoked_users.pop(uid, None)
+    db = SessionLocal()
+    try:
+        db.execute(delete(SessionRow).where(SessionRow.expiry < now))
+        db.commit()
+    except Exception:
+        db.rollback()
+    finally:
+        db.close()
+
+async def _session_purge_loop():
+    while True:
+        await run_in_threadpool(purge_expired_sessions)
+        await asyncio.sleep(SESSION_PURGE_INTERVAL_S)
+
+async def _denylist_refresh_loop():
+    while True:
+        await asyncio.sleep(SESSION_DENYLIST_REFRESH_S)
+        await run_in_threadpool(_load_revoked_sessions)
+
+def optimize_sqlite(vacuum: bool = False) -> None:
+    """Refresh SQLite planner stats and, optionally, compact the file."""
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if vacuum:
+                conn.execute(text("VACUUM"))  # cannot run inside a transaction
+            conn.execute(text("PRAGMA optimize"))
+    except Exception:
+        pass  # best-effort; retried next interval
+
+async def _sqlite_maintenance_loop():
+    await run_in_threadpool(optimize_sqlite)
+    while True:
+        await asyncio.sleep(SQLITE_VACUUM_INTERVAL_S)
+        await run_in_threadpool(optimize_sqlite, True)
+
+_maintenance_tasks: list[asyncio.Task] = []
+
+@app.on_event("startup")
+async def _start_maintenance():
+    _maintenance_tasks.append(asyncio.create_task(_session_purge_loop()))
+    _maintenance_tasks.append(asyncio.create_task(_denylist_refresh_loop()))
+    if DATABASE_URL.startswith("sqlite:///"):
+        _maintenance_tasks.append(asyncio.create_task(_sqlite_maintenance_loop()))
+
+@app.on_event("shutdown")
+async def _stop_maintenance():
+    while _maintenance_tasks:
+        _maintenance_tasks.pop().cancel()
 
 @app.post("/api/auth/register")
 def register_user(payload: dict, request: Request, response: Response, db: Session = Depends(get_db)):
@@ -343,11 +926,6 @@ def register_user(payload: dict, request: Request, response: Response, db: Sessi
     if not username or not email or not password:
         raise HTTPException(status_code=400, detail="Missing required fields")
 
-    if db.query(User).filter(User.username == username).first():
-        raise HTTPException(status_code=400, detail="Username already exists")
-    if db.query(User).filter(User.email == email).first():
-        raise HTTPException(status_code=400, detail="Email already exists")
-
     # seed with defaults and normalize types if provided
     base_settings = _ensure_settings_shape({**DEFAULT_SETTINGS, **(settings or {})})
     # Normalize achievements into the full expected shape
@@ -356,15 +934,25 @@ def register_user(payload: dict, request: Request, response: Response, db: Sessi
     user = User(
         username=username,
         email=email,
-        password=password,
+        password=hash_password(password),
         settings=base_settings,
-        achievements=base_ach,
+        **_achievement_columns(base_ach),
     )
+    # Insert optimistically and let the UNIQUE constraints catch duplicates;
+    # only a collision pays for the lookup that names the clashing field.
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        clashing = db.scalars(
+            select(User.username).where(or_(User.username == username, User.email == email))
+        ).all()
+        if username in clashing:
+            raise HTTPException(status_code=400, detail="Username already exists")
+        raise HTTPException(status_code=400, detail="Email already exists")
 
-    sid = create_session(user.id, db)
+    sid = create_session(user.id)
     # Cross-site compatible cookie (Vercel -> Render): SameSite=None; Secure on HTTPS
     response.set_cookie(
         key="session_id",
@@ -382,11 +970,13 @@ def login_user(payload: dict, request: Request, response: Response, db: Session
     if not identifier or not password:
         raise HTTPException(status_code=400, detail="Missing credentials")
 
-    user = db.query(User).filter(or_(User.username == identifier, User.email == identifier)).first()
-    if not user or user.password != password:
+    user = db.scalars(
+        select(User).where(or_(User.username == identifier, User.email == identifier)).limit(1)
+    ).first()
+    if not user or not verify_password(password, user.password):
         raise HTTPException(status_code=401, detail="Invalid username/email or password")
 
-    sid = create_session(user.id, db)
+    sid = create_session(user.id)
     response.set_cookie(
         key="session_id",
         value=sid,
@@ -396,58 +986,35 @@ def login_user(payload: dict, request: Request, response: Response, db: Session
 
 @app.post("/api/auth/logout")
 def logout_user(response: Response, request: Request, db: Session = Depends(get_db)):
-    sid = request.cookies.get("session_id")
-    if sid:
-        row = db.query(SessionRow).filter(SessionRow.id == sid).first()
-        if row:
-            try:
-                db.delete(row)
-                db.commit()
-            except Exception:
-                db.rollback()
+    revoke_session(request.cookies.get("session_id"), db)
     response.delete_cookie("session_id", path="/")
     return {"message": "Logged out"}
 
 @app.get("/api/auth/me")
-def get_me(request: Request, db: Session = Depends(get_db)):
-    user = current_user_from_cookie(request, db)
-    if not user:
+async def get_me(request: Request):
+    # Normalization + persistence of missing keys happens in
+    # current_profile_from_cookie (prevents UI from showing zeros forever).
+    profile = await current_profile_from_cookie(request)
+    if not profile:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    # Normalize and persist any missing keys on-the-fly so the client always
-    # receives a complete structure (prevents UI from showing zeros forever).
-    fixed_ach = _ensure_achievements_shape(user.achievements)
-    fixed_settings = _ensure_settings_shape(user.settings)
-    if user.achievements != fixed_ach or user.settings != fixed_settings:
-        user.achievements = fixed_ach
-        user.settings = fixed_settings
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-
-    return {
-        "id": user.id,
-        "username": user.username,
-        "email": user.email,
-        "settings": user.settings or DEFAULT_SETTINGS,
-        "achievements": fixed_ach,
-    }
+    return profile
 
 # ---- Achievements & Settings (existing) ----
 @app.get("/api/me/progress")
-def me_progress(request: Request, db: Session = Depends(get_db)):
-    user = current_user_from_cookie(request, db)
-    if not user:
+async def me_progress(request: Request):
+    profile = await current_profile_from_cookie(request)
+    if not profile:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    ach = _ensure_achievements_shape(user.achievements)
+    ach = profile["achievements"]
     streak = int(ach.get("streak_days", 0) or 0)
     return {"streak": max(0, streak)}
 
 @app.get("/api/me/achievements")
-def me_achievements(request: Request, db: Session = Depends(get_db)):
-    user = current_user_from_cookie(request, db)
-    if not user:
+async def me_achievements(request: Request):
+    profile = await current_profile_from_cookie(request)
+    if not profile:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    ach = _ensure_achievements_shape(user.achievements)
+    ach = profile["achievements"]
     badges = ach.get("badges")
     return badges if isinstance(badges, list) else []
 
@@ -469,10 +1036,9 @@ def update_settings(payload: dict, request: Request, db: Session = Depends(get_d
     # Shallow update then re-normalize types/values
     base.update(incoming)
     user.settings = _ensure_settings_shape(base)
-    db.add(user)
     db.commit()
-    db.refresh(user)
-    return {"ok": True, "settings": user.settings}
+    _user_cache_forget(user_id=user.id)
+    return {"ok": True, "settings": _client_view(user.settings)}
 
 # ---- Profile actions (new) ----
 @app.post("/api/account/change_email")
@@ -505,14 +1071,12 @@ def change_email(payload: dict, request: Request, db: Session = Depends(get_db))
         return {"ok": True, "email": user.email}
 
     # Enforce uniqueness across users
-    existing = db.query(User).filter(User.email == new_email).first()
-    if existing and existing.id != user.id:
+    if _user_exists(db, User.email == new_email, User.id != user.id):
         raise HTTPException(status_code=400, detail="Email already exists")
 
     user.email = new_email
-    db.add(user)
     db.commit()
-    db.refresh(user)
+    _user_cache_forget(user_id=user.id)
     return {"ok": True, "email": user.email}
 
 
@@ -538,14 +1102,12 @@ def change_display_name(payload: dict, request: Request, db: Session = Depends(g
         raise HTTPException(status_code=400, detail="Display name is too long")
 
     # Ensure no other user already has this username
-    existing = db.query(User).filter(User.username == new_name).first()
-    if existing and existing.id != user.id:
+    if _user_exists(db, User.username == new_name, User.id != user.id):
         raise HTTPException(status_code=400, detail="That display name is already taken")
 
     user.username = new_name
-    db.add(user)
     db.commit()
-    db.refresh(user)
+    _user_cache_forget(user_id=user.id)
     return {"ok": True, "username": user.username}
 
 
@@ -559,13 +1121,14 @@ def change_password(payload: dict, request: Request, db: Session = Depends(get_d
     new_pw = (payload.get("new_password") or "").strip()
     if not current_pw or not new_pw:
         raise HTTPException(status_code=400, detail="Missing password fields")
-    if user.password != current_pw:
+    if not verify_password(current_pw, user.password):
         raise HTTPException(status_code=403, detail="Incorrect current password")
     if len(new_pw) < 6:
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
 
-    user.password = new_pw
-    db.add(user); db.commit(); db.refresh(user)
+    user.password = hash_password(new_pw)
+    db.commit()
+    _user_cache_forget(user_id=user.id)
     return {"ok": True}
 
 @app.post("/api/account/clear_data")
@@ -578,12 +1141,13 @@ def clear_data(payload: dict, request: Request, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=401, detail="Unauthorized")
     pw = (payload.get("password") or "").strip()
-    if user.password != pw:
+    if not verify_password(pw, user.password):
         raise HTTPException(status_code=403, detail="Incorrect password")
 
-    user.settings = deepcopy(DEFAULT_SETTINGS)
-    user.achievements = deepcopy(DEFAULT_ACHIEVEMENTS)
-    db.add(user); db.commit(); db.refresh(user)
+    user.settings = _ensure_settings_shape(None)
+    _store_achievements(user, _ensure_achievements_shape(None))
+    db.commit()
+    _user_cache_forget(user_id=user.id)
     return {"ok": True}
 
 @app.post("/api/account/delete")
@@ -595,21 +1159,16 @@ def delete_account(payload: dict, request: Request, response: Response, db: Sess
     if not user:
         raise HTTPException(status_code=401, detail="Unauthorized")
     pw = (payload.get("password") or "").strip()
-    if user.password != pw:
+    if not verify_password(pw, user.password):
         raise HTTPException(status_code=403, detail="Incorrect password")
 
-    db.delete(user); db.commit()
-
-    # Remove the current session row if present
-    sid = request.cookies.get("session_id")
-    if sid:
-        row = db.query(SessionRow).filter(SessionRow.id == sid).first()
-        if row:
-            try:
-                db.delete(row)
-                db.commit()
-            except Exception:
-                db.rollback()
+    uid = user.id
+    db.execute(delete(Story).where(Story.user_id == uid))
+    db.delete(user)
+    # Revoke every session of this user (all devices) in the same transaction
+    revoke_user_sessions(uid, db, commit=False)
+    db.commit()
+    _user_cache_forget(user_id=uid)
     response.delete_cookie("session_id", path="/")
 
     return {"ok": True}
@@ -620,76 +1179,48 @@ def ach_event(payload: dict, request: Request, db: Session = Depends(get_db)):
     """
     Record an achievement event (caption / quiz / story) and update the user's daily streak.
     """
-    user = current_user_from_cookie(request, db)
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-
+    uid = current_user_id_from_cookie(request)
     kind = (payload.get("type") or "").strip().lower()
-    if kind not in {"caption", "quiz", "story"}:
+    if kind not in EVENT_BADGES:
+        if uid is None or not _user_exists(db, User.id == uid):
+            raise HTTPException(status_code=401, detail="Unauthorized")
         raise HTTPException(status_code=400, detail="Invalid event type")
 
-    # Load and normalize existing achievements
-    ach = _ensure_achievements_shape(user.achievements)
-    ach_counts = dict(ach.get("counts") or {"captions": 0, "quizzes": 0, "stories": 0})
-    badges = list(ach.get("badges") or [])
-    streak = int(ach.get("streak_days", 0) or 0)
-
-    now_iso = datetime.utcnow().isoformat() + "Z"
-
-    def has_badge(bid: str) -> bool:
-        return any(isinstance(b, dict) and b.get("id") == bid for b in badges)
-
-    # === EVENT COUNTS & FIRST-TIME BADGES ===
-    if kind == "caption":
-        ach_counts["captions"] += 1
-        if not has_badge("first_caption"):
-            badges.append({
-                "id": "first_caption",
-                "title": "First Caption",
-                "description": "Generate your first caption",
-                "unlocked_at": now_iso
-            })
-    elif kind == "quiz":
-        ach_counts["quizzes"] += 1
-        if not has_badge("quiz_whiz"):
-            badges.append({
-                "id": "quiz_whiz",
-                "title": "Quiz Whiz",
-                "description": "Complete your first quiz",
-                "unlocked_at": now_iso
-            })
-    elif kind == "story":
-        ach_counts["stories"] += 1
-        if not has_badge("storyteller"):
-            badges.append({
-                "id": "storyteller",
-                "title": "Storyteller",
-                "description": "Create your first story",
-                "unlocked_at": now_iso
-            })
+    counts_key, first_bid, first_title, first_desc = EVENT_BADGES[kind]
+    counter = getattr(User, f"counts_{counts_key}")
 
-    # === DAILY STREAK TRACKING ===
+    # === EVENT COUNT & DAILY STREAK (one conditional UPDATE) ===
     today = datetime.utcnow().date()
-    last_raw = ach.get("last_active_at")
-    last_date = None
-    if isinstance(last_raw, str):
-        try:
-            last_date = datetime.fromisoformat(last_raw.replace("Z", "")).date()
-        except Exception:
-            pass
-
-    if last_date == today:
-        pass  # already counted today
-    elif last_date == (today - timedelta(days=1)):
-        streak += 1
-    else:
-        streak = 1
+    row = db.execute(
+        update(User)
+        .where(User.id == uid)
+        .values({
+            User.streak_days: case(
+                (User.last_active_date == today, User.streak_days),           # already counted today
+                (User.last_active_date == today - timedelta(days=1), User.streak_days + 1),
+                else_=1,
+            ),
+            User.last_active_date: today,
+            counter: counter + 1,
+        })
+        .returning(
+            User.achievements, User.streak_days, User.last_active_date,
+            User.counts_captions, User.counts_quizzes, User.counts_stories,
+        )
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
 
-    ach["last_active_at"] = today.isoformat()
+    # === FIRST-TIME & STREAK BADGES (JSON only touched when one unlocks) ===
+    ach = row.achievements if isinstance(row.achievements, dict) else {}
+    badges = list(ach.get("badges") or [])
+    owned_ids = {b.get("id") for b in badges if isinstance(b, dict)}
+    now_iso = datetime.utcnow().isoformat() + "Z"
 
-    # === STREAK BADGES ===
     def add_badge(bid, title, desc):
-        if not has_badge(bid):
+        if bid not in owned_ids:
+            owned_ids.add(bid)
             badges.append({
                 "id": bid,
                 "title": title,
@@ -697,22 +1228,21 @@ def ach_event(payload: dict, request: Request, db: Session = Depends(get_db)):
                 "unlocked_at": now_iso
             })
 
-    if streak >= 7:
-        add_badge("streak_7", "7-Day Streak", "Use the app 7 days in a row")
-    if streak >= 30:
-        add_badge("streak_30", "30-Day Streak", "Use the app 30 days in a row")
+    n_before = len(badges)
+    add_badge(first_bid, first_title, first_desc)
+    for min_streak, bid, title, desc in STREAK_BADGES:
+        if row.streak_days >= min_streak:
+            add_badge(bid, title, desc)
+    if len(badges) != n_before:
+        ach = {**ach, "badges": badges}
+        db.execute(update(User).where(User.id == uid).values(achievements=ach))
 
-    # === SAVE BACK ===
-    ach["streak_days"] = streak
-    ach["counts"] = ach_counts
-    ach["badges"] = badges
-    user.achievements = ach
-
-    db.add(user)
     db.commit()
-    db.refresh(user)
+    _user_cache_forget(user_id=uid)
 
-    return {"ok": True, "achievements": user.achievements}
+    view = _achievements_view(row)
+    view["badges"] = badges
+    return {"ok": True, "achievements": view}
 
 # --- Stories: save / list / get ---
 class StoryIn(BaseModel):
@@ -721,18 +1251,27 @@ class StoryIn(BaseModel):
     images: List[str]              # exactly 3 image URLs as returned by /api/story
     story: Optional[str] = None    # optional full story text
 
-def _get_user_stories(user: User) -> list:
-    settings = user.settings or {}
-    stories = settings.get("stories")
-    if not isinstance(stories, list):
-        stories = []
-    return stories
+def _story_user_id(request: Request, db: Session) -> int:
+    """Current user id for the stories endpoints (401 if the account is gone)."""
+    uid = current_user_id_from_cookie(request)
+    found, _ = _user_column(db, uid, User.id)
+    if not found:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return uid
+
+def _story_dict(st: Story) -> dict:
+    return {
+        "id": st.id,
+        "title": st.title,
+        "panels": st.panels,
+        "images": st.images,
+        "story": st.story,
+        "saved_at": st.saved_at.isoformat() + "Z",
+    }
 
 @app.post("/api/stories/save")
 def save_story(payload: StoryIn, request: Request, db: Session = Depends(get_db)):
-    user = current_user_from_cookie(request, db)
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+    uid = _story_user_id(request, db)
 
     data = payload.dict()
     # Basic validation/trim
@@ -742,66 +1281,52 @@ def save_story(payload: StoryIn, request: Request, db: Session = Depends(get_db)
     if len(panels) != 3 or len(images) != 3:
         raise HTTPException(status_code=400, detail="Need 3 panels and 3 images")
 
-    stories = _get_user_stories(user)
     story_id = secrets.token_urlsafe(10)
-    stories.append({
-        "id": story_id,
-        "title": title,
-        "panels": panels,
-        "images": images,
-        "story": (data.get("story") or "\n".join(panels)).strip(),
-        "saved_at": datetime.utcnow().isoformat() + "Z",
-    })
-    # persist back under settings
-    s = user.settings or {}
-    s["stories"] = stories
-    user.settings = s
-    db.add(user); db.commit(); db.refresh(user)
+    db.add(Story(
+        id=story_id,
+        user_id=uid,
+        title=title,
+        panels=panels,
+        images=images,
+        story=(data.get("story") or "\n".join(panels)).strip(),
+        saved_at=datetime.utcnow(),
+    ))
+    db.commit()
     return {"ok": True, "id": story_id}
 
 @app.get("/api/stories/list")
-def list_stories(request: Request, db: Session = Depends(get_db)):
-    user = current_user_from_cookie(request, db)
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    stories = _get_user_stories(user)
-    # Most recent first (if saved_at present)
-    try:
-        stories = sorted(stories, key=lambda s: s.get("saved_at",""), reverse=True)
-    except Exception:
-        pass
-    # return just a tiny index for the Draw page
-    return [{"id": s.get("id"), "title": s.get("title","Untitled Story")} for s in stories]
+def list_stories(request: Request, limit: int = 50, offset: int = 0, db: Session = Depends(get_db)):
+    uid = _story_user_id(request, db)
+    # Most recent first; return just a tiny index for the Draw page
+    rows = db.execute(
+        select(Story.id, Story.title)
+        .where(Story.user_id == uid)
+        .order_by(Story.saved_at.desc())
+        .limit(max(1, min(200, limit)))
+        .offset(max(0, offset))
+    ).all()
+    return [{"id": sid, "title": title or "Untitled Story"} for sid, title in rows]
 
 @app.get("/api/stories/get")
 def get_story(id: str, request: Request, db: Session = Depends(get_db)):
-    user = current_user_from_cookie(request, db)
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    for s in _get_user_stories(user):
-        if s.get("id") == id:
-            return {"ok": True, "story": s}
-    raise HTTPException(status_code=404, detail="Story not found")
+    uid = _story_user_id(request, db)
+    st = db.get(Story, id)
+    if st is None or st.user_id != uid:
+        raise HTTPException(status_code=404, detail="Story not found")
+    return {"ok": True, "story": _story_dict(st)}
 
 @app.post("/api/stories/delete")
 def delete_story(payload: dict, request: Request, db: Session = Depends(get_db)):
     """Delete a saved story by id for the current user."""
-    user = current_user_from_cookie(request, db)
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+    uid = _story_user_id(request, db)
 
     sid = (payload.get("id") or "").strip()
     if not sid:
         raise HTTPException(status_code=400, detail="Missing story id")
 
-    stories = _get_user_stories(user)
-    new_list = [s for s in stories if s.get("id") != sid]
-    if len(new_list) == len(stories):
+    res = db.execute(delete(Story).where(Story.id == sid, Story.user_id == uid))
+    if not res.rowcount:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Story not found")
-
-    # persist
-    s = user.settings or {}
-    s["stories"] = new_list
-    user.settings = s
-    db.add(user); db.commit(); db.refresh(user)
+    db.commit()
     return {"ok": True}
@@ -1,13 +1,25 @@
 from __future__ import annotations
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from typing import Literal, Tuple, Union
+from typing import BinaryIO, Callable, Iterator, Literal, Optional, Tuple, Union
 
 import numpy as np
 from PIL import Image
-from colorspacious import cspace_convert
+from colorspacious import cspace_converter, machado_et_al_2009_matrix
+
+# ---------- Optional CuPy (GPU path for large images) ----------
+try:
+    import cupy as cp  # matching cupy-cudaXXx wheel; not in requirements.txt
+    _HAS_CUPY = cp.cuda.runtime.getDeviceCount() > 0
+except Exception:
+    cp = None
+    _HAS_CUPY = False
 
 # ---- FastAPI bits live in the same file ----
 from fastapi import APIRouter, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 
 # Public router you will import in main.py
@@ -24,32 +36,144 @@ def _normalize_type(cvd: str) -> str:
     if cvd.startswith("trit"):  return "tritanomaly"
     return "none"
 
-def _to_numpy_rgb(img: Image.Image) -> Tuple[np.ndarray, np.ndarray | None]:
+# Rows per strip in the strip loops: bounds the float32 working set to a few
+# W x 256 x 3 buffers per worker instead of several full-image copies.
+TILE_ROWS = 256
+
+# Strips are independent and the heavy NumPy calls release the GIL, so an
+# image spanning several strips is processed on a small shared pool.
+STRIP_WORKERS = max(1, min(8, os.cpu_count() or 1))
+_strip_pool = ThreadPoolExecutor(max_workers=STRIP_WORKERS, thread_name_prefix="cvd-strip") if STRIP_WORKERS > 1 else None
+
+def _for_each_strip(h: int, strip: Callable[[int, int], None]) -> None:
+    """Call strip(y0, y1) for every TILE_ROWS band of an image of height h."""
+    bands = [(y, min(y + TILE_ROWS, h)) for y in range(0, h, TILE_ROWS)]
+    if _strip_pool is None or len(bands) < 2:
+        for y0, y1 in bands:
+            strip(y0, y1)
+        return
+    # list() waits for every band and re-raises the first failure
+    list(_strip_pool.map(lambda b: strip(*b), bands))
+
+def _to_rgb_mode(img: Image.Image) -> Image.Image:
     if img.mode not in ("RGB", "RGBA"):
         img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
-    arr = np.asarray(img).astype(np.float32) / 255.0
-    if arr.ndim == 2:
-        arr = np.stack([arr, arr, arr], axis=-1)
-    if arr.shape[-1] == 4:
-        return arr[..., :3], arr[..., 3:4]
-    return arr, None
-
-def _to_image(rgb: np.ndarray, a: np.ndarray | None) -> Image.Image:
-    rgb = np.clip(rgb, 0.0, 1.0)
-    if a is not None:
-        rgba = np.concatenate([rgb, np.clip(a, 0.0, 1.0)], axis=-1)
-        return Image.fromarray((rgba * 255 + 0.5).astype(np.uint8), "RGBA")
-    return Image.fromarray((rgb * 255 + 0.5).astype(np.uint8), "RGB")
+    return img
 
-def simulate(rgb: np.ndarray, cvd_type: CVDChoice, severity: float) -> np.ndarray:
+def _to_numpy_u8(img: Image.Image) -> np.ndarray:
+    """HxWx3 (RGB) or HxWx4 (RGBA) uint8 array for any PIL mode."""
+    if img.mode == "L":
+        # Greyscale: a read-only RGB view of the single channel instead of a
+        # PIL convert() copy (the strip loops only read their input)
+        g = np.asarray(img)
+        return np.broadcast_to(g[..., None], g.shape + (3,))
+    return np.asarray(_to_rgb_mode(img))
+
+def _apply_tiled(arr: np.ndarray, fn: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+    """
+    Run `fn` (float32 linear sRGB -> float sRGB in 0..1) over a uint8 RGB(A)
+    image in row strips: uint8 -> linear via the byte LUT into a float32
+    scratch -> fn -> clip -> uint8 output. Alpha is copied through unchanged.
+    """
+    h, w, c = arr.shape
+    out = np.empty_like(arr)
+    if c == 4:
+        out[..., 3] = arr[..., 3]
+
+    def strip(y0: int, y1: int) -> None:
+        f = np.take(_SRGB_U8_TO_LIN, arr[y0:y1, :, :3])  # exact sRGB decode, no powers
+        res = fn(f)
+        np.clip(res, 0.0, 1.0, out=res)
+        res *= 255
+        res += 0.5
+        out[y0:y1, :, :3] = res  # truncating cast, like astype(np.uint8)
+
+    _for_each_strip(h, strip)
+    return out
+
+# Machado et al. (2009) simulation matrices, applied in linear sRGB -- the same
+# ones colorspacious' "sRGB1+CVD" space uses, precomputed per integer severity.
+_CVD_MATRICES = {
+    (t, sev): machado_et_al_2009_matrix(t, sev).astype(np.float32)
+    for t in ("protanomaly", "deuteranomaly", "tritanomaly")
+    for sev in range(101)
+}
+
+# sRGB transfer curve (IEC 61966-2-1), same thresholds as colorspacious
+def _srgb_to_linear(c: np.ndarray) -> np.ndarray:
+    return np.where(c < 0.04045, c / 12.92, ((np.maximum(c, 0.04045) + 0.055) / 1.055) ** 2.4)
+
+def _linear_to_srgb(c: np.ndarray) -> np.ndarray:
+    return np.where(c <= 0.0031308, c * 12.92, 1.055 * np.maximum(c, 0.0031308) ** (1 / 2.4) - 0.055)
+
+# uint8 fast path: sRGB byte -> linear float32 (256 entries), and linear
+# quantized to 16 bits -> sRGB byte (65536 entries, well under 0.1 LSB error)
+_LIN_LEVELS = 65535
+_SRGB_U8_TO_LIN = _srgb_to_linear(np.arange(256) / 255.0).astype(np.float32)
+_LIN_TO_SRGB_U8 = (_linear_to_srgb(np.arange(_LIN_LEVELS + 1) / _LIN_LEVELS) * 255 + 0.5).astype(np.uint8)
+
+def _cvd_matrix(cvd_type: CVDChoice, severity: float) -> np.ndarray | None:
+    """Cached simulation matrix, or None when the filter is a no-op."""
     if severity <= 0 or cvd_type == "none":
+        return None
+    return _CVD_MATRICES[(_normalize_type(cvd_type), min(100, int(round(100 * float(severity)))))]
+
+# Below this many pixels the host<->device copies outweigh the GPU speedup
+GPU_MIN_PIXELS = 2_000_000
+
+@functools.lru_cache(maxsize=1)
+def _gpu_tables():
+    return cp.asarray(_SRGB_U8_TO_LIN), cp.asarray(_LIN_TO_SRGB_U8)
+
+def _simulate_u8_gpu(arr: np.ndarray, m: np.ndarray) -> np.ndarray:
+    """_simulate_u8 on the GPU: same tables and matrix, whole image at once."""
+    to_lin, to_srgb = _gpu_tables()
+    d = cp.asarray(arr)
+    out = d.copy()  # carries alpha through
+    v = to_lin[d[..., :3]].reshape(-1, 3) @ cp.asarray(m).T
+    cp.clip(v, 0.0, 1.0, out=v)
+    v *= _LIN_LEVELS
+    idx = cp.rint(v).astype(cp.uint16)
+    out[..., :3] = to_srgb[idx].reshape(d.shape[:2] + (3,))
+    return cp.asnumpy(out)
+
+def _simulate_u8(arr: np.ndarray, m: np.ndarray) -> np.ndarray:
+    """simulate() for a uint8 RGB(A) image via lookup tables, in row strips."""
+    h, w, c = arr.shape
+    if _HAS_CUPY and h * w >= GPU_MIN_PIXELS:
+        try:
+            return _simulate_u8_gpu(arr, m)
+        except Exception:
+            pass  # e.g. out of device memory: fall back to the CPU path
+    out = np.empty_like(arr)
+    if c == 4:
+        out[..., 3] = arr[..., 3]
+
+    def strip(y0: int, y1: int) -> None:
+        src = arr[y0:y1, :, :3]
+        v = _SRGB_U8_TO_LIN[src].reshape(-1, 3) @ m.T
+        # Clipping in linear space == clipping the sRGB result (monotonic curve)
+        np.clip(v, 0.0, 1.0, out=v)
+        v *= _LIN_LEVELS
+        idx = np.rint(v, out=v).astype(np.uint16)
+        out[y0:y1, :, :3] = _LIN_TO_SRGB_U8[idx].reshape(src.shape)
+
+    _for_each_strip(h, strip)
+    return out
+
+def simulate(rgb: np.ndarray, cvd_type: CVDChoice, severity: float) -> np.ndarray:
+    m = _cvd_matrix(cvd_type, severity)
+    if m is None:
         return rgb.copy()
-    space = {
-        "name": "sRGB1+CVD",
-        "cvd_type": _normalize_type(cvd_type),
-        "severity": int(round(100 * float(severity))),  # 0..100
-    }
-    return cspace_convert(rgb, space, "sRGB1")
+    lin = _srgb_to_linear(rgb)
+    out = lin.reshape(-1, 3) @ m.T
+    return _linear_to_srgb(out.reshape(rgb.shape))
+
+# colorspacious resolves its conversion graph on every cspace_convert() call;
+# daltonize runs once per strip, so resolve the two paths it needs up front.
+# Both inputs enter from linear sRGB, which daltonize already has in float32.
+_LINEAR_TO_CAM02UCS = cspace_converter("sRGB1-linear", "CAM02-UCS")
+_CAM02UCS_TO_SRGB1 = cspace_converter("CAM02-UCS", "sRGB1")
 
 def daltonize(
     rgb: np.ndarray,
@@ -57,27 +181,89 @@ def daltonize(
     severity: float,
     amount: float = 1.0
 ) -> np.ndarray:
-    if severity <= 0 or cvd_type == "none":
+    m = _cvd_matrix(cvd_type, severity)
+    if m is None:
         return rgb.copy()
-    sim = simulate(rgb, cvd_type, severity)
-    o = cspace_convert(rgb, "sRGB1", "CAM02-UCS")
-    s = cspace_convert(sim, "sRGB1", "CAM02-UCS")
-    delta = o - s
-    delta[..., 0] = 0.0  # keep lightness stable
-    return cspace_convert(o + amount * delta, "CAM02-UCS", "sRGB1")
+    return _daltonize_linear(np.ascontiguousarray(_srgb_to_linear(rgb), dtype=np.float32), m, amount)
+
+def _daltonize_linear(lin: np.ndarray, m: np.ndarray, amount: float) -> np.ndarray:
+    """daltonize() from linear sRGB input; returns (non-linear) sRGB."""
+    # Feed CAM02-UCS from linear sRGB: skips re-encoding the simulation and
+    # colorspacious' two re-linearizations (all float64 powers)
+    o = _LINEAR_TO_CAM02UCS(lin)
+    s = _LINEAR_TO_CAM02UCS((lin.reshape(-1, 3) @ m.T).reshape(lin.shape))
+    # o + amount * (o - s), lightness kept stable -- computed in place in
+    # s's buffer instead of allocating delta and sum temporaries
+    np.subtract(o, s, out=s)
+    s *= amount
+    s += o
+    s[..., 0] = o[..., 0]
+    return _CAM02UCS_TO_SRGB1(s)
 
 def apply(
-    image: Union[str, BytesIO, Image.Image],
+    image: Union[str, BinaryIO, Image.Image],
     *,
     mode: ModeChoice,
     cvd_type: CVDChoice,
     severity: float,
     amount: float = 1.0
 ) -> Image.Image:
-    pil = Image.open(image) if isinstance(image, (str, BytesIO)) else image
-    rgb, a = _to_numpy_rgb(pil)
-    out = simulate(rgb, cvd_type, severity) if mode == "simulate" else daltonize(rgb, cvd_type, severity, amount)
-    return _to_image(out, a)
+    # Paths and any binary file object (BytesIO, an upload's spooled file) are
+    # opened lazily; PIL reads the pixels straight from them
+    pil = image if isinstance(image, Image.Image) else Image.open(image)
+    m = _cvd_matrix(cvd_type, severity)
+    if m is None:
+        # No-op filter: hand back the pixels without a numpy round trip
+        rgb_img = _to_rgb_mode(pil)
+        return rgb_img.copy() if rgb_img is pil else rgb_img
+    # uint8 in, uint8 out; fromarray copies once into PIL's own storage
+    arr = _to_numpy_u8(pil)
+    if mode == "simulate":
+        return Image.fromarray(_simulate_u8(arr, m))
+    fn = lambda lin: _daltonize_linear(lin, m, amount)
+    return Image.fromarray(_apply_tiled(arr, fn))
+
+# ---------- Response encoding ----------
+# format -> (PIL format, save options, media type). WebP keeps alpha and
+# encodes far faster than PNG's DEFLATE; PNG stays available for lossless.
+ENCODINGS = {
+    "webp": ("WEBP", {"quality": 90, "method": 0}, "image/webp"),   # method 0 = fastest
+    "jpeg": ("JPEG", {"quality": 90}, "image/jpeg"),
+    # zlib level 1 encodes ~3x faster than PIL's default 6 for ~10% more bytes
+    "png": ("PNG", {"compress_level": 1, "optimize": False}, "image/png"),
+}
+ENCODINGS["jpg"] = ENCODINGS["jpeg"]
+DEFAULT_FORMAT = "webp"
+CHUNK_SIZE = 64 * 1024
+
+def _quality_opts(pil_fmt: str, quality: Optional[int]) -> dict:
+    """Map a 0..100 `quality` onto the writer's own knob (PNG: zlib level 0..9)."""
+    if quality is None:
+        return {}
+    q = max(0, min(100, int(quality)))
+    if pil_fmt == "PNG":
+        return {"compress_level": min(9, q // 10)}
+    return {"quality": q}
+
+def encode(img: Image.Image, fmt: str = DEFAULT_FORMAT, quality: Optional[int] = None) -> Tuple[BytesIO, str]:
+    """Encode `img` for the response; returns (buffer at 0, media type)."""
+    pil_fmt, opts, media_type = ENCODINGS.get((fmt or "").lower(), ENCODINGS[DEFAULT_FORMAT])
+    opts = {**opts, **_quality_opts(pil_fmt, quality)}
+    if pil_fmt == "JPEG" and img.mode != "RGB":
+        img = img.convert("RGB")  # JPEG has no alpha
+    buf = BytesIO()
+    img.save(buf, format=pil_fmt, **opts)
+    buf.seek(0)
+    return buf, media_type
+
+def apply_and_encode(image, *, fmt: str = DEFAULT_FORMAT, quality: Optional[int] = None, **kwargs) -> Tuple[BytesIO, str]:
+    """apply() + encode() in one call, so routes can run both off the event loop."""
+    return encode(apply(image, **kwargs), fmt, quality)
+
+def iter_chunks(buf: BytesIO, size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    # Iterating a BytesIO directly would split binary data on b"\n"
+    while chunk := buf.read(size):
+        yield chunk
 
 # ---------- FastAPI route (same file) ----------
 @router.post("/cvd/apply")
@@ -87,16 +273,18 @@ async def cvd_apply_api(
     cvd_type: str = Form("deutan"),        # "protan" | "deutan" | "tritan" | "none"
     severity: float = Form(1.0),           # 0..1
     amount: float = Form(1.0),             # daltonize strength
+    format: str = Form(DEFAULT_FORMAT),    # "webp" | "jpeg" | "png"
+    quality: Optional[int] = Form(None),   # 0..100; PNG maps it to zlib level
 ):
-    raw = await image.read()
-    out_img = apply(
-        BytesIO(raw),
+    await image.seek(0)
+    buf, media_type = await run_in_threadpool(
+        apply_and_encode,
+        image.file,
+        fmt=format,
+        quality=quality,
         mode="daltonize" if mode == "daltonize" else "simulate",
         cvd_type=cvd_type if cvd_type in ("protan", "deutan", "tritan", "none") else "deutan",
         severity=max(0.0, min(1.0, severity)),
         amount=amount,
     )
-    buf = BytesIO()
-    out_img.save(buf, format="PNG")
-    buf.seek(0)
-    return StreamingResponse(buf, media_type="image/png")
+    return StreamingResponse(iter_chunks(buf), media_type=media_type)
@@ -2,9 +2,10 @@
 Dev entrypoint to run the FastAPI server.
 
 It ensures the repository root is on sys.path so that
-``from server.main import app`` works no matter where this
+``server.main:app`` imports no matter where this
 script is launched from (e.g., via npm from client/).
 Also loads the repo-level .env and enables reload.
+For production use ``prod_api.py`` instead.
 
 Usage:
   python ../server/dev_api.py
@@ -26,12 +27,12 @@ if str(REPO_ROOT) not in sys.path:
 # Load environment variables from repo root
 load_dotenv(REPO_ROOT / ".env")
 
-# Import the ASGI app directly (after sys.path fix)
-from server.main import app  # type: ignore  # noqa: E402
-
 if __name__ == "__main__":
+    # reload needs an import string (uvicorn re-imports the app in a child
+    # process); app_dir puts the repo root on that process's sys.path too.
     uvicorn.run(
-        app,
+        "server.main:app",
+        app_dir=str(REPO_ROOT),
         host="127.0.0.1",
         port=8000,
         reload=True,
@@ -3,17 +3,21 @@ from __future__ import annotations
 
 import io
 import os
+import asyncio
 import re
-import json
 import time
 import uuid
+import stat
 import base64
+import heapq
 import tempfile
-from hashlib import sha1
+from collections import OrderedDict
+from hashlib import blake2b
 from pathlib import Path
 from typing import Optional, Literal
 
 from fastapi import FastAPI, UploadFile, File, Form, Body
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
@@ -21,21 +25,31 @@ from dotenv import load_dotenv
 
 from PIL import Image
 
-# --- App + subapps / engines you already had ---
-from .auth_DB import app as auth_subapp
-from .story_gen import StoryGenerator
-from .quiz_gen import QuizGenerator
+# Decoders tried for uploads, so PIL doesn't probe every registered plugin.
+# Covers what browsers produce for <input accept="image/*"> and canvas captures.
+UPLOAD_FORMATS = ("JPEG", "PNG", "WEBP", "GIF", "BMP")
 
-# ---------- App ----------
-app = FastAPI(title="Picteractive API")
+try:
+    from diskcache import Cache as _DiskCache  # optional: persistent caption cache
+except Exception:
+    _DiskCache = None
 
-# Ensure environment variables (from repo root .env) are loaded when launched via uvicorn
+# Ensure environment variables (from repo root .env) are loaded when launched via uvicorn,
+# before auth_DB reads DATABASE_URL / SESSION_SECRET at import time
 try:
     REPO_ROOT = Path(__file__).resolve().parent.parent
     env_loaded = load_dotenv(REPO_ROOT / ".env") or load_dotenv(".env")
 except Exception:
     env_loaded = False
 
+# --- App + subapps / engines you already had ---
+from .auth_DB import app as auth_subapp, DEFAULT_RESPONSE_CLASS, json_dumps, json_loads
+from .story_gen import StoryGenerator
+from .quiz_gen import QuizGenerator, QuizBatcher
+
+# ---------- App ----------
+app = FastAPI(title="Picteractive API", default_response_class=DEFAULT_RESPONSE_CLASS)
+
 # CORS (credentials + configurable origins)
 _origins_env = os.getenv("ALLOWED_ORIGINS", "")
 _origin_regex = os.getenv("ALLOWED_ORIGIN_REGEX", r"https://.*\.vercel\.app$")
@@ -64,76 +78,143 @@ app.include_router(auth_subapp.router)
 BASE = Path(__file__).resolve().parent
 DATA = BASE / "data"
 IMG_DIR = DATA / "scenes"
-ITEMS_JSON = DATA / "items.json"
+ITEMS_JSON = DATA / "items.json"      # legacy whole-file list, migrated once
+ITEMS_JSONL = DATA / "items.jsonl"    # append-only, one saved item per line
 IMG_DIR.mkdir(parents=True, exist_ok=True)
-if not ITEMS_JSON.exists():
-    ITEMS_JSON.write_text("[]", encoding="utf-8")
+if not ITEMS_JSONL.exists():
+    try:
+        _legacy = json_loads(ITEMS_JSON.read_bytes()) if ITEMS_JSON.exists() else []
+    except Exception:
+        _legacy = []
+    ITEMS_JSONL.write_text("".join(json_dumps(o) + "\n" for o in _legacy), encoding="utf-8")
+
+# In-memory copy of items.jsonl. Other workers append to the same file, so
+# _load_items() reads whatever was added past _ITEMS_OFFSET since last time.
+_ITEMS: list[dict] = []
+_ITEMS_OFFSET = 0
 
 
 def _load_items():
+    global _ITEMS_OFFSET
     try:
-        return json.loads(ITEMS_JSON.read_text(encoding="utf-8"))
+        if ITEMS_JSONL.stat().st_size > _ITEMS_OFFSET:
+            with open(ITEMS_JSONL, "rb") as f:
+                f.seek(_ITEMS_OFFSET)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # partial line from a concurrent append; pick it up next time
+                    _ITEMS_OFFSET += len(line)
+                    if line.strip():
+                        _ITEMS.append(json_loads(line))
     except Exception:
-        return []
+        pass
+    return _ITEMS
 
 
-def _save_items(items):
-    ITEMS_JSON.write_text(json.dumps(items, ensure_ascii=False, indent=2), encoding="utf-8")
+def _append_item(obj: dict):
+    with open(ITEMS_JSONL, "a", encoding="utf-8") as f:
+        f.write(json_dumps(obj) + "\n")
+    _load_items()  # picks up this line (and any from other workers)
 
 
 # ---------- OpenAI client (caption provider) ----------
-from openai import OpenAI
-_openai_client = OpenAI()
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+import httpx
 
-# Tiny in-memory caption cache (per-process)
-_CAP_CACHE: dict[str, dict] = {}
+try:
+    import h2  # noqa: F401  (httpx[http2]); HTTP/2 multiplexes concurrent calls on one connection
+    _HAS_H2 = True
+except Exception:
+    _HAS_H2 = False
+
+# Async client: Vision calls no longer hold a thread (or the event loop) while
+# waiting, and the pooled connection skips TCP/TLS setup on every caption.
+_openai_client = AsyncOpenAI(
+    http_client=DefaultAsyncHttpxClient(
+        http2=_HAS_H2,
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+    )
+)
+
+# Tiny in-memory caption cache (per-process LRU)
+_CAP_CACHE: "OrderedDict[str, dict]" = OrderedDict()
 _CAP_CACHE_MAX = 64  # small cap
 
+# Second tier on disk, shared by workers and kept across restarts, so a
+# repeated image doesn't cost another Vision call. Memory-only without diskcache.
+_CAP_DISK_TTL_S = 7 * 86400
+try:
+    _CAP_DISK = _DiskCache(str(DATA / "caption_cache"), size_limit=2 * 1024**3) if _DiskCache else None
+except Exception:
+    _CAP_DISK = None
+
+
+def _cap_mem_put(k: str, v: dict):
+    if k in _CAP_CACHE:
+        _CAP_CACHE.move_to_end(k)
+    elif len(_CAP_CACHE) >= _CAP_CACHE_MAX:
+        _CAP_CACHE.popitem(last=False)  # evict least recently used
+    _CAP_CACHE[k] = v
+
 
 def _cap_cache_get(k: str):
-    return _CAP_CACHE.get(k)
+    v = _CAP_CACHE.get(k)
+    if v is not None:
+        _CAP_CACHE.move_to_end(k)  # mark as most recently used
+        return v
+    if _CAP_DISK is not None:
+        try:
+            v = _CAP_DISK.get(k)
+        except Exception:
+            v = None
+        if v is not None:
+            _cap_mem_put(k, v)  # promote disk hit
+    return v
 
 
 def _cap_cache_put(k: str, v: dict):
-    if len(_CAP_CACHE) >= _CAP_CACHE_MAX:
-        # drop an arbitrary/oldest key
+    _cap_mem_put(k, v)
+    if _CAP_DISK is not None:
         try:
-            _CAP_CACHE.pop(next(iter(_CAP_CACHE)))
+            _CAP_DISK.set(k, v, expire=_CAP_DISK_TTL_S)
         except Exception:
-            _CAP_CACHE.clear()
-    _CAP_CACHE[k] = v
+            pass
 
 
 # ---------- Object parsing helpers (fruits/veggies/animals/birds) ----------
-_FRUITS = {
+_FRUITS = frozenset({
     "apple","apples","banana","bananas","orange","oranges","grape","grapes","pear","pears",
     "mango","mangoes","pineapple","pineapples","strawberry","strawberries","watermelon","watermelons",
     "papaya","papayas","kiwi","kiwis","peach","peaches","plum","plums","cherry","cherries","lemon","lemons",
     "lime","limes","pomegranate","pomegranates","blueberry","blueberries","raspberry","raspberries","avocado","avocados"
-}
-_VEGETABLES = {
+})
+_VEGETABLES = frozenset({
     "carrot","carrots","potato","potatoes","tomato","tomatoes","onion","onions","garlic","garlics",
     "cucumber","cucumbers","pepper","peppers","capsicum","capsicums","broccoli","broccolis","cauliflower","cauliflowers",
     "spinach","lettuce","cabbage","cabbages","eggplant","eggplants","brinjal","brinjals","okra","ladyfinger","ladyfingers",
     "chilli","chillies","bean","beans","pea","peas","corn","corns","pumpkin","pumpkins"
-}
-_ANIMALS = {
+})
+_ANIMALS = frozenset({
     "cat","cats","dog","dogs","cow","cows","horse","horses","sheep","goat","goats","rabbit","rabbits",
     "tiger","tigers","lion","lions","elephant","elephants","bear","bears","zebra","zebras","giraffe","giraffes",
     "monkey","monkeys","panda","pandas","kangaroo","kangaroos","fox","foxes","wolf","wolves","deer","deers","mouse","mice"
-}
-_BIRDS = {
+})
+_BIRDS = frozenset({
     "bird","birds","sparrow","sparrows","pigeon","pigeons","dove","doves","eagle","eagles",
     "owl","owls","parrot","parrots","crow","crows","peacock","peacocks","duck","ducks","chicken","chickens"
+})
+
+# name -> category in one lookup; built lowest-priority first so fruit,
+# vegetable, bird, animal keeps winning for any name listed twice
+_CAT_MAP: dict[str, str] = {
+    n: cat
+    for names, cat in ((_ANIMALS, "animal"), (_BIRDS, "bird"), (_VEGETABLES, "vegetable"), (_FRUITS, "fruit"))
+    for n in names
 }
 
 def _cat_of(name: str) -> str:
-    w = (name or "").lower().strip()
-    if w in _FRUITS: return "fruit"
-    if w in _VEGETABLES: return "vegetable"
-    if w in _BIRDS: return "bird"
-    if w in _ANIMALS: return "animal"
-    return "other"
+    return _CAT_MAP.get((name or "").lower().strip(), "other")
 
 # digits like "3 apples" OR number-words like "three apples"
 _WORD_TO_NUM = {
@@ -141,9 +222,15 @@ _WORD_TO_NUM = {
     "six":6, "seven":7, "eight":8, "nine":9, "ten":10,
     "eleven":11, "twelve":12
 }
+# Three separate passes on purpose: their matches overlap ("three apples and a
+# pear (2)"), so one alternation would let an earlier branch swallow the others
 _NUM_DIGIT_RE = re.compile(r"\b(\d+)\s+([A-Za-z][A-Za-z\- ]+?)\b")
-_NUM_WORD_RE  = re.compile(r"\b(" + "|".join(_WORD_TO_NUM.keys()) + r")\s+([A-Za-z][A-Za-z\- ]+?)\b", re.I)
+# number words go longest first so the engine doesn't retry shorter prefixes
+_NUM_WORDS_ALT = "|".join(sorted(_WORD_TO_NUM, key=len, reverse=True))
+_NUM_WORD_RE  = re.compile(r"\b(" + _NUM_WORDS_ALT + r")\s+([A-Za-z][A-Za-z\- ]+?)\b", re.I)
 _PAREN_COUNT_RE = re.compile(r"\b([A-Za-z][A-Za-z\- ]+?)\s*\((\d+)\)")
+# cheap prefilter: a caption with no digit and no number word has no counts
+_NUM_HINT_RE = re.compile(r"\d|\b(?:" + _NUM_WORDS_ALT + r")\b", re.I)
 
 def _normalize_name(name: str) -> str:
     return (name or "").lower().strip().rstrip("s").strip()
@@ -158,7 +245,7 @@ def _parse_objects_from_text(text: str):
     seen = {}
 
     t = (text or "").strip()
-    if not t:
+    if not t or not _NUM_HINT_RE.search(t):
         return out
 
     # 1) digit form: "3 apples"
@@ -189,22 +276,25 @@ def _parse_objects_from_text(text: str):
 
 
 # ---------- Small text helper ----------
+_SENT_SPLIT_RE = re.compile(r'(?<=[\.!?])\s+')
+_DESC_PREFIX_RE = re.compile(r"(?i)^\s*description:\s*")
+
 def _split_sentences(text: str):
-    parts = re.split(r'(?<=[\.!?])\s+', (text or "").strip())
+    parts = _SENT_SPLIT_RE.split((text or "").strip())
     return [p.strip() for p in parts if p.strip()]
 
 
 # ---------- Caption core (OpenAI Vision) ----------
-def _detailed_caption_openai(pil: Image.Image, region=None, *, speed: str = "fast") -> dict:
-    """
-    Returns a ONE-SENTENCE caption (plus derived fields).
+# An upload that is already a JPEG this small goes to Vision as-is (no re-encode)
+_CAPTION_PASSTHROUGH_MAX = 512_000
+# Vision gains nothing past ~1024px on the long edge for a one-line caption
+_CAPTION_MAX_SIDE = 1024
 
-    Style:
-    - Always start with: "The image shows"
-    - Natural, child-friendly wording
-    - No need to mention exact counts of objects unless really important
-    """
+
+def _caption_data_url(pil: Image.Image, region=None, raw: Optional[bytes] = None) -> str:
+    """Crop/downscale/encode the image for Vision; returns a JPEG data URL."""
     # Optional crop
+    cropped = False
     if region:
         try:
             x = max(0, int(region.get("x", 0)))
@@ -212,14 +302,44 @@ def _detailed_caption_openai(pil: Image.Image, region=None, *, speed: str = "fas
             w = max(1, int(region.get("w", 1)))
             h = max(1, int(region.get("h", 1)))
             pil = pil.crop((x, y, x + w, y + h))
+            cropped = True
         except Exception:
             pass
 
+    # Downscale big camera shots; fewer bytes to upload and base64
+    resized = max(pil.size) > _CAPTION_MAX_SIDE
+    if resized:
+        pil.thumbnail((_CAPTION_MAX_SIDE, _CAPTION_MAX_SIDE), Image.Resampling.LANCZOS)
+
     # Encode image → base64 data URL
-    buf = io.BytesIO()
-    pil.save(buf, format="JPEG", quality=92)
-    b64 = base64.b64encode(buf.getvalue()).decode("utf-8")
-    data_url = f"data:image/jpeg;base64,{b64}"
+    if raw is not None and not (cropped or resized) and raw[:3] == b"\xff\xd8\xff" and len(raw) < _CAPTION_PASSTHROUGH_MAX:
+        jpeg = raw
+    else:
+        buf = io.BytesIO()
+        pil.save(buf, format="JPEG", quality=85, optimize=False)
+        jpeg = buf.getvalue()
+    b64 = base64.b64encode(jpeg).decode("ascii")
+    return f"data:image/jpeg;base64,{b64}"
+
+
+class _CaptionFailed(Exception):
+    """The Vision call failed or came back empty; `.result` is the placeholder to show (never cached)."""
+    def __init__(self, result: dict):
+        super().__init__(result["caption"])
+        self.result = result
+
+
+async def _detailed_caption_openai(pil: Image.Image, region=None, *, speed: str = "fast", raw: Optional[bytes] = None) -> dict:
+    """
+    Returns a ONE-SENTENCE caption (plus derived fields).
+
+    Style:
+    - Always start with: "The image shows"
+    - Natural, child-friendly wording
+    - No need to mention exact counts of objects unless really important
+    """
+    # crop + JPEG encode are CPU-bound; keep them off the loop
+    data_url = await run_in_threadpool(_caption_data_url, pil, region, raw)
 
     # New style instruction
     instruction = (
@@ -235,7 +355,7 @@ def _detailed_caption_openai(pil: Image.Image, region=None, *, speed: str = "fas
     temperature = 0.4
 
     try:
-        r = _openai_client.chat.completions.create(
+        r = await _openai_client.chat.completions.create(
             model=os.getenv("CAPTION_OPENAI_MODEL", "gpt-4o-mini"),
             messages=[{
                 "role": "user",
@@ -256,8 +376,8 @@ def _detailed_caption_openai(pil: Image.Image, region=None, *, speed: str = "fas
         text = ""
 
     # Normalize → ONE sentence
-    text = re.sub(r"(?i)^\s*description:\s*", "", text).strip()
-    parts = re.split(r'(?<=[\.!?])\s+', text) if text else []
+    text = _DESC_PREFIX_RE.sub("", text).strip()
+    parts = _SENT_SPLIT_RE.split(text) if text else []
     one = (parts[0] if parts else "").strip()
 
     # Ensure it starts with "The image shows"
@@ -271,12 +391,18 @@ def _detailed_caption_openai(pil: Image.Image, region=None, *, speed: str = "fas
             else:
                 one = "The image shows " + one
     else:
-        one = "The image shows a scene that could not be described clearly."
+        # transient (timeout, rate limit, outage) or empty reply: report it so the
+        # placeholder isn't cached against this image
+        raise _CaptionFailed(_caption_result("The image shows a scene that could not be described clearly."))
 
     # Ensure terminal punctuation
     if one and one[-1] not in ".!?":
         one += "."
 
+    return _caption_result(one)
+
+
+def _caption_result(one: str) -> dict:
     # Derive objects (still works if the model occasionally uses numbers)
     objects = _parse_objects_from_text(one)
 
@@ -343,7 +469,7 @@ def story_status():
 
 
 @app.post("/api/story_test")
-def story_test():
+async def story_test():
     # Smoke test payload
     t = "A LITTLE ADVENTURE"
     p = [
@@ -355,6 +481,21 @@ def story_test():
 
 
 # ---------- Caption (OpenAI-backed + cached) ----------
+# Identical captions already in flight (double taps, retries, several tabs)
+# share one Vision call instead of each paying for their own.
+_CAP_INFLIGHT: dict[str, asyncio.Task] = {}
+
+
+async def _caption_coalesced(key: str, pil: Image.Image, region_box, speed: str, raw: bytes) -> dict:
+    task = _CAP_INFLIGHT.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_detailed_caption_openai(pil, region=region_box, speed=speed, raw=raw))
+        _CAP_INFLIGHT[key] = task
+        task.add_done_callback(lambda _t: _CAP_INFLIGHT.pop(key, None))
+    # shield: one client disconnecting must not cancel the call for the others
+    return await asyncio.shield(task)
+
+
 @app.post("/api/caption")
 async def caption(
     image: UploadFile = File(...),
@@ -364,7 +505,7 @@ async def caption(
 ):
     try:
         raw = await image.read()
-        pil = Image.open(io.BytesIO(raw)).convert("RGB")
+        pil = await run_in_threadpool(lambda: Image.open(io.BytesIO(raw), formats=UPLOAD_FORMATS).convert("RGB"))
     except Exception as e:
         return JSONResponse(content={"error": f"invalid_image: {e}"}, status_code=400)
 
@@ -372,51 +513,62 @@ async def caption(
     region_norm = ""
     if region:
         try:
-            region_box = json.loads(region)
-            region_norm = json.dumps(region_box, sort_keys=True)
+            region_box = json_loads(region)
+            region_norm = json_dumps(region_box, sort_keys=True)
         except Exception:
             region_box = None
 
-    # cache key on (image bytes + region + speed + mode)
-    key = sha1(b"v4|" + raw + b"|" + region_norm.encode() + b"|" + str(speed).encode() + b"|" + str(mode).encode()).hexdigest()
+    # cache key on (image bytes + region + speed + mode); hashed piecewise so
+    # the upload is never copied into one concatenated buffer
+    h = blake2b(digest_size=20)
+    for part in (b"v5|", raw, b"|", region_norm.encode(), b"|", str(speed).encode(), b"|", str(mode).encode()):
+        h.update(part)
+    key = h.hexdigest()
     hit = _cap_cache_get(key)
     if hit is not None:
         if (mode or "").lower() not in ("detailed", "description"):
             return {"caption": hit.get("caption", "")}
         return hit
 
+    # Only real captions are cached (both tiers); a failed call is retried next time
     try:
-        result = _detailed_caption_openai(pil, region=region_box, speed=(speed or "fast"))
+        result = await _caption_coalesced(key, pil, region_box, (speed or "fast"), raw)
         _cap_cache_put(key, result)
-        if (mode or "").lower() not in ("detailed", "description"):
-            return {"caption": (result.get("caption") or "").strip()}
-        return result
+    except _CaptionFailed as e:
+        result = e.result
     except Exception:
-        empty = {"caption": "", "sentences": [], "paragraph": "", "labels": [], "objects": [], "mode": "detailed"}
-        _cap_cache_put(key, empty)
-        if (mode or "").lower() not in ("detailed", "description"):
-            return {"caption": ""}
-        return empty
+        result = {"caption": "", "sentences": [], "paragraph": "", "labels": [], "objects": [], "mode": "detailed"}
+    if (mode or "").lower() not in ("detailed", "description"):
+        return {"caption": (result.get("caption") or "").strip()}
+    return result
 
 
 # ---------- Save / Recent / Serve image ----------
+# Stored images are UI previews: favour a fast encode over the last few bytes
+SAVE_JPEG_OPTS = dict(quality=85, optimize=False, progressive=False, subsampling=2)
+
+
+def _open_upload_rgb(upload: UploadFile) -> Image.Image:
+    """Decode an upload straight from its spooled temp file (no bytes copy in RAM)."""
+    upload.file.seek(0)
+    return Image.open(upload.file, formats=UPLOAD_FORMATS).convert("RGB")
+
+
 @app.post("/api/save")
 async def save_item(caption: str = Form(...), image: UploadFile = File(...)):
     try:
-        data = await image.read()
         img_id = f"{uuid.uuid4().hex}.jpg"
         img_path = IMG_DIR / img_id
-        Image.open(io.BytesIO(data)).convert("RGB").save(img_path, "JPEG", quality=92)
+        pil = await run_in_threadpool(_open_upload_rgb, image)
+        await run_in_threadpool(pil.save, img_path, "JPEG", **SAVE_JPEG_OPTS)
 
-        items = _load_items()
         obj = {
             "id": uuid.uuid4().hex,
             "imageUrl": f"/api/image/{img_id}",
             "caption": caption,
             "savedAt": int(time.time() * 1000),
         }
-        items.append(obj)
-        _save_items(items)
+        _append_item(obj)
         return obj
     except Exception as e:
         return JSONResponse(content={"error": f"save_error: {e}"}, status_code=500)
@@ -428,15 +580,30 @@ async def recent():
     return items[-1] if items else {}
 
 
+# Stored names are random and never rewritten, so browsers may cache them forever
+_IMAGE_CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+
 @app.get("/api/image/{name}")
 async def serve_image(name: str):
     path = IMG_DIR / name
-    if not path.exists():
+    try:
+        st = path.stat()  # one stat, handed to FileResponse so it doesn't repeat it
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISREG(st.st_mode):
         return JSONResponse(content={"error": "not_found"}, status_code=404)
-    return FileResponse(path, media_type="image/jpeg")
+    return FileResponse(path, stat_result=st, media_type="image/jpeg", headers=_IMAGE_CACHE_HEADERS)
 
 
 # ---------- CVD (color-vision) filter ----------
+# Imported once at load; None means the pipeline (numpy/colorspacious) is unavailable
+try:
+    from .csvd_filter import apply_and_encode as _cvd_apply_and_encode, iter_chunks as _cvd_iter_chunks
+except Exception:
+    _cvd_apply_and_encode = _cvd_iter_chunks = None
+
+
 @app.post("/api/cvd/apply")
 async def cvd_apply(
     image: UploadFile = File(...),
@@ -444,17 +611,17 @@ async def cvd_apply(
     cvd_type: str = Form("deuteranopia"),
     severity: float = Form(1.0),
     amount: float = Form(1.0),
+    format: str = Form("webp"),
+    quality: Optional[int] = Form(None),
 ):
     """
     Apply colour-vision simulation/daltonization using the proper CVD pipeline.
+    The result is WebP by default (`format` = webp | jpeg | png); `quality`
+    (0..100) overrides the encoder default, and for PNG picks the zlib level.
     If the specialized pipeline isn't available at runtime, we just echo the image back.
     """
-    raw = await image.read()
-
-    try:
-        from .csvd_filter import apply as cvd_apply_image  # lazy import
-    except Exception:
-        buf = io.BytesIO(raw)
+    if _cvd_apply_and_encode is None:
+        buf = io.BytesIO(await image.read())
         return StreamingResponse(buf, media_type="image/png")
 
     t = (cvd_type or "").lower()
@@ -470,11 +637,14 @@ async def cvd_apply(
     sev = float(max(0.0, min(1.0, float(severity))))
     mode_norm = "daltonize" if mode == "daltonize" else "simulate"
 
-    out_img = cvd_apply_image(io.BytesIO(raw), mode=mode_norm, cvd_type=t, severity=sev, amount=float(amount))
-    buf = io.BytesIO()
-    out_img.save(buf, format="PNG")
-    buf.seek(0)
-    return StreamingResponse(buf, media_type="image/png")
+    # Filter + encode are CPU-bound; keep them off the event loop. PIL reads
+    # the upload's spooled file directly instead of a bytes + BytesIO copy.
+    await image.seek(0)
+    buf, media_type = await run_in_threadpool(
+        _cvd_apply_and_encode, image.file, fmt=format, quality=quality,
+        mode=mode_norm, cvd_type=t, severity=sev, amount=float(amount),
+    )
+    return StreamingResponse(_cvd_iter_chunks(buf), media_type=media_type)
 
 
 # ---------- Story Generation (kept) ----------
@@ -489,6 +659,51 @@ except Exception as e:
     story_engine = _StoryStub()
 
 
+def _persist_scene(img: Image.Image, idx: int) -> Optional[str]:
+    fname = f"scene_{int(time.time())}_{uuid.uuid4().hex[:8]}_{idx}.jpg"
+    try:
+        img.save(IMG_DIR / fname, "JPEG", **SAVE_JPEG_OPTS)
+        return fname
+    except Exception:
+        return None
+
+
+def _story_payload(title, panels, moral, scenes, deltas, names) -> dict:
+    panels = [(panels[i] if i < len(panels) and panels[i] else "") for i in range(3)]
+    return {
+        "title": title,
+        "story": "\n".join(panels),
+        "panels": panels,
+        "moral": moral,
+        "captions": [s.get("caption", "") for s in scenes],
+        "scenes": scenes,
+        "deltas": deltas,
+        "labels": [[], [], []],
+        "images": [f"/api/image/{n}" if n else "" for n in names],
+    }
+
+
+def _story_error(e: Exception) -> dict:
+    return {
+        "error": f"{type(e).__name__}: {e}",
+        "title": "A LITTLE ADVENTURE",
+        "panels": [
+            "We see a simple scene.",
+            "Then something changes.",
+            "Finally, it ends happily.",
+        ],
+        "moral": "We learn and smile together.",
+    }
+
+
+async def _story_inputs(files):
+    # decode the three panels concurrently on the thread pool
+    pils = list(await asyncio.gather(*(run_in_threadpool(_open_upload_rgb, f) for f in files)))
+    eng = _ensure_story_engine()
+    scenes, deltas = eng.build_scenes(pils, [[], [], []])
+    return eng, pils, scenes, deltas
+
+
 @app.post("/api/story")
 async def story_api(
     image1: UploadFile = File(...),
@@ -500,53 +715,58 @@ async def story_api(
     Story generation reuses your existing StoryGenerator pipeline.
     """
     try:
-        raw1, raw2, raw3 = await image1.read(), await image2.read(), await image3.read()
-        p1 = Image.open(io.BytesIO(raw1)).convert("RGB")
-        p2 = Image.open(io.BytesIO(raw2)).convert("RGB")
-        p3 = Image.open(io.BytesIO(raw3)).convert("RGB")
-
-        eng = _ensure_story_engine()
-        scenes, deltas = eng.build_scenes([p1, p2, p3], [[], [], []])
-        title, panels, moral = eng.generate_from_scenes(scenes, deltas, mood=mood)
-        story_text = "\n".join(panels)
-
-        # Persist inputs for UI use
-        names = []
-        for idx, img in enumerate([p1, p2, p3], start=1):
-            fname = f"scene_{int(time.time())}_{uuid.uuid4().hex[:8]}_{idx}.jpg"
-            out_path = IMG_DIR / fname
-            try:
-                img.save(out_path, "JPEG", quality=92)
-                names.append(fname)
-            except Exception:
-                names.append(None)
-        image_urls = [f"/api/image/{n}" if n else "" for n in names]
-
-        panels = [(panels[i] if i < len(panels) and panels[i] else "") for i in range(3)]
+        eng, pils, scenes, deltas = await _story_inputs((image1, image2, image3))
+        # The OpenAI call blocks, so it runs on the thread pool (with these images,
+        # not the engine's shared _last_images) while the inputs are persisted for
+        # the UI alongside it (JPEG encodes run concurrently)
+        (title, panels, moral), *names = await asyncio.gather(
+            run_in_threadpool(eng.generate_from_images, pils, mood),
+            *(run_in_threadpool(_persist_scene, img, idx) for idx, img in enumerate(pils, start=1)),
+        )
+        return _story_payload(title, panels, moral, scenes, deltas, names)
+
+    except Exception as e:
+        return _story_error(e)
+
+
+def _sse(event: dict) -> bytes:
+    return b"data: " + json_dumps(event).encode("utf-8") + b"\n\n"
 
-        return {
-            "title": title,
-            "story": story_text,
-            "panels": panels,
-            "moral": moral,
-            "captions": [s.get("caption", "") for s in scenes],
-            "scenes": scenes,
-            "deltas": deltas,
-            "labels": [[], [], []],
-            "images": image_urls,
-        }
 
+@app.post("/api/story/stream")
+async def story_stream_api(
+    image1: UploadFile = File(...),
+    image2: UploadFile = File(...),
+    image3: UploadFile = File(...),
+    mood: str = Form("friendly"),
+):
+    """
+    /api/story as Server-Sent Events: {"type": "panel", "index", "text"} as soon as
+    each panel is written, then {"type": "done", ...} with the /api/story payload
+    (or {"type": "error", ...} with its fallback story).
+    """
+    try:
+        eng, pils, scenes, deltas = await _story_inputs((image1, image2, image3))
     except Exception as e:
-        return {
-            "error": f"{type(e).__name__}: {e}",
-            "title": "A LITTLE ADVENTURE",
-            "panels": [
-                "We see a simple scene.",
-                "Then something changes.",
-                "Finally, it ends happily.",
-            ],
-            "moral": "We learn and smile together.",
-        }
+        err = _story_error(e)
+        return StreamingResponse(iter([_sse({"type": "error", **err})]), media_type="text/event-stream")
+
+    def events():
+        # a plain generator: StreamingResponse iterates it on the thread pool,
+        # so the blocking OpenAI stream never holds the event loop
+        try:
+            for ev in eng.stream_from_images(pils, mood=mood):
+                if ev["type"] == "panel":
+                    yield _sse(ev)
+                elif ev["type"] == "done":
+                    names = [_persist_scene(img, idx) for idx, img in enumerate(pils, start=1)]
+                    payload = _story_payload(ev["title"], ev["panels"], ev["moral"], scenes, deltas, names)
+                    yield _sse({"type": "done", **payload})
+        except Exception as e:
+            yield _sse({"type": "error", **_story_error(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 # ---------- Quiz ----------
@@ -556,19 +776,23 @@ class QuizIn(BaseModel):
 
 
 quiz_engine = QuizGenerator()
+# Concurrent quiz requests share one batched HF pipeline call (no-op for OpenAI)
+quiz_batcher = QuizBatcher(quiz_engine)
 
 
 @app.post("/api/quiz")
-def api_quiz(payload: dict = Body(...)):
+async def api_quiz(payload: dict = Body(...)):
     """
-    Input: { "caption": str, "count": 3 }
+    Input: { "caption": str, "count": 3, "image_hash"?: str }
     Output: { "questions": [{question, options[3], answer_index}] }
+    image_hash (optional) lets a re-shown image reuse its quiz even if the caption text changed.
     """
     try:
         caption = (payload.get("caption") or "").strip()
         count = int(payload.get("count") or 3)
         count = 3 if count < 3 else min(count, 3)
-        qs = quiz_engine.generate(caption, num_questions=count)
+        image_hash = (str(payload.get("image_hash") or "").strip() or None)
+        qs = await quiz_batcher.submit(caption, count, image_hash)
         return {"questions": qs}
     except Exception as e:
         fb = quiz_engine._dynamic_questions(payload.get("caption") or "", 3, quiz_engine._extract_facts(payload.get("caption") or ""))
@@ -581,8 +805,18 @@ class TranslateIn(BaseModel):
     lang: Literal["en", "zh", "ms", "ta"]  # include 'en' for quick revert
 
 
+def _translate_google(text: str, target: str) -> str:
+    from deep_translator import GoogleTranslator as DTGoogle
+    return (DTGoogle(source="auto", target=target).translate(text) or "").strip()
+
+
+def _translate_mymemory(text: str, target: str) -> str:
+    from deep_translator import MyMemoryTranslator
+    return (MyMemoryTranslator(source="en", target=target).translate(text) or "").strip()
+
+
 @app.post("/api/translate")
-def api_translate(payload: TranslateIn):
+async def api_translate(payload: TranslateIn):
     text = (payload.text or "").strip()
     if not text:
         return JSONResponse(content={"error": "empty_text"}, status_code=400)
@@ -596,16 +830,15 @@ def api_translate(payload: TranslateIn):
     translated = None
     errors = []
 
+    # deep_translator is blocking HTTP; run it on the thread pool
     try:
-        from deep_translator import GoogleTranslator as DTGoogle
-        translated = (DTGoogle(source="auto", target=target).translate(text) or "").strip()
+        translated = await run_in_threadpool(_translate_google, text, target)
     except Exception as e:
         errors.append(f"google:{type(e).__name__}")
 
     if not translated:
         try:
-            from deep_translator import MyMemoryTranslator
-            translated = (MyMemoryTranslator(source="en", target=target).translate(text) or "").strip()
+            translated = await run_in_threadpool(_translate_mymemory, text, target)
         except Exception as e:
             errors.append(f"mymemory:{type(e).__name__}")
 
@@ -652,7 +885,7 @@ async def tts(payload: TTSIn):
         # playbackRate (0.5x / 1.0x / 1.5x).
         tts_obj = gTTS(text=text, lang="en", tld=tld, slow=False)
         buf = io.BytesIO()
-        tts_obj.write_to_fp(buf)
+        await run_in_threadpool(tts_obj.write_to_fp, buf)  # blocking HTTP to Google
         buf.seek(0)
         # Frontend treats this as a generic audio blob; mp3 is fine.
         return StreamingResponse(buf, media_type="audio/mpeg")
@@ -667,24 +900,98 @@ try:
 except Exception:
     wn = None  # graceful fallback if missing
 
+# one pooled client: keeps the TCP/TLS connection to dictionaryapi.dev alive
+_DICT_HTTP = httpx.AsyncClient(timeout=5.0, http2=_HAS_H2, headers={"User-Agent": "picteractive/1.0"})
+
+# Words repeat a lot while reading stories; keep found entries for an hour
+DICT_CACHE_MAX = 1024
+DICT_CACHE_TTL_S = 3600.0
+_dict_cache: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+
+
+def _dict_cache_get(w: str) -> Optional[dict]:
+    hit = _dict_cache.get(w)
+    if hit is None:
+        return None
+    if hit[0] < time.monotonic():
+        del _dict_cache[w]
+        return None
+    _dict_cache.move_to_end(w)
+    return hit[1]
+
+
+def _dict_cache_put(w: str, entry: dict) -> None:
+    _dict_cache[w] = (time.monotonic() + DICT_CACHE_TTL_S, entry)
+    _dict_cache.move_to_end(w)
+    while len(_dict_cache) > DICT_CACHE_MAX:
+        _dict_cache.popitem(last=False)
+
+
+@app.on_event("shutdown")
+async def _close_httpx():
+    await _DICT_HTTP.aclose()
+    await _openai_client.close()
+
+
+def _wordnet_entry(w: str):
+    if wn is None:
+        return None
+    try:
+        synsets = wn.synsets(w)
+    except Exception:
+        synsets = []
+
+    definition = ""
+    examples = []
+    synonyms = set()
+
+    for s in synsets:
+        if not definition and s.definition():
+            definition = s.definition()
+        ex = s.examples()
+        if ex:
+            examples.extend(ex[:1])
+        for l in s.lemmas():
+            name = l.name().replace("_", " ")
+            synonyms.add(name)
+
+    synonyms.discard(w)
+    if definition or examples or synonyms:
+        return {
+            "definition": definition,
+            "synonyms": heapq.nsmallest(8, synonyms),
+            "examples": examples[:3],
+        }
+    return None
+
 
 @app.get("/api/dictionary")
-def api_dictionary(word: str):
+async def api_dictionary(word: str):
     """Return a short dictionary entry for the given word."""
     w = (word or "").strip().lower()
     if not w:
         return JSONResponse(content={"error": "empty_word"}, status_code=400)
 
+    entry = _dict_cache_get(w)
+    if entry is None:
+        entry = await _lookup_word(w)
+        if entry is None:
+            # 3) Final safe fallback: empty entry so UI still renders (not cached,
+            #    it usually means the API was unreachable).
+            return {"definition": "", "synonyms": [], "examples": []}
+        _dict_cache_put(w, entry)
+    return entry
+
+
+async def _lookup_word(w: str) -> Optional[dict]:
     definition = ""
     examples: list[str] = []
     synonyms: set[str] = set()
 
     # 1) Try free online API (dictionaryapi.dev) – works on Render, no auth.
     try:
-        import httpx
-
         url = f"https://api.dictionaryapi.dev/api/v2/entries/en/{w}"
-        r = httpx.get(url, timeout=5.0)
+        r = await _DICT_HTTP.get(url)
         if r.status_code == 200:
             data = r.json()
             if isinstance(data, list) and data:
@@ -706,7 +1013,7 @@ def api_dictionary(word: str):
                 synonyms.discard(w)
                 return {
                     "definition": definition,
-                    "synonyms": sorted(synonyms)[:8],
+                    "synonyms": heapq.nsmallest(8, synonyms),
                     "examples": examples[:3],
                 }
     except Exception:
@@ -714,42 +1021,14 @@ def api_dictionary(word: str):
         pass
 
     # 2) Fallback to local WordNet if available (primarily for offline dev).
-    if wn is not None:
-        try:
-            synsets = wn.synsets(w)
-        except Exception:
-            synsets = []
-
-        definition = ""
-        examples = []
-        synonyms = set()
-
-        for s in synsets:
-            if not definition and s.definition():
-                definition = s.definition()
-            ex = s.examples()
-            if ex:
-                examples.extend(ex[:1])
-            for l in s.lemmas():
-                name = l.name().replace("_", " ")
-                synonyms.add(name)
-
-        synonyms.discard(w)
-        if definition or examples or synonyms:
-            return {
-                "definition": definition,
-                "synonyms": sorted(synonyms)[:8],
-                "examples": examples[:3],
-            }
-
-    # 3) Final safe fallback: empty entry so UI still renders.
-    return {"definition": "", "synonyms": [], "examples": []}
+    #    Corpus loading/lookup is blocking disk work, so keep it off the loop.
+    return await run_in_threadpool(_wordnet_entry, w) if wn is not None else None
 
 # Simple OpenAI ping (kept)
 @app.get("/api/openai_ping")
-def openai_ping():
+async def openai_ping():
     try:
-        r = _openai_client.chat.completions.create(
+        r = await _openai_client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[{"role":"user","content":"Respond with OK"}],
             max_tokens=3,
@@ -0,0 +1,43 @@
+"""
+Production entrypoint to run the FastAPI server.
+
+Same sys.path / .env handling as ``dev_api.py``, but without the file
+watcher: several worker processes, uvloop + httptools when installed
+(``uvicorn[standard]``), bound to all interfaces.
+
+Env:
+  PORT              listen port (default 8000)
+  WEB_CONCURRENCY   worker processes (default: half the CPU cores, min 1)
+
+Usage:
+  python server/prod_api.py
+"""
+
+from pathlib import Path
+import os
+import sys
+import uvicorn
+from dotenv import load_dotenv
+
+SERVER_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SERVER_DIR.parent
+
+# Ensure imports like `from server.main import app` resolve
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+# Load environment variables from repo root
+load_dotenv(REPO_ROOT / ".env")
+
+if __name__ == "__main__":
+    uvicorn.run(
+        # workers > 1 needs an import string so each process imports the app
+        "server.main:app",
+        app_dir=str(REPO_ROOT),
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        workers=int(os.getenv("WEB_CONCURRENCY") or max(1, (os.cpu_count() or 2) // 2)),
+        loop="auto",    # uvloop if installed
+        http="auto",    # httptools if installed
+        reload=False,
+    )
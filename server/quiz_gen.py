@@ -21,61 +21,358 @@ Env toggles
 - QUIZ_PROVIDER=openai     -> select OpenAI path
 - QUIZ_OPENAI_MODEL        -> defaults to "gpt-4o-mini"
 - QUIZGEN_MODEL=flan|gpt2  -> selects HF fallback preference (default flan)
+- QUIZ_CACHE_PATH          -> optional JSON file the LLM response cache is kept in across restarts
+- QUIZ_SEED                -> RNG seed for option order/distractors (default 1337; "random" = fresh per process)
+- QUIZ_MIN_TOKENS_FOR_LLM  -> shorter captions skip the LLM and use the dynamic generator (default 4)
+- QUIZ_COMPILE=1           -> torch.compile the HF model (GPU only)
+- QUIZ_ORT=1               -> run the HF model through ONNX Runtime via optimum (GPU only)
 """
 
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from pathlib import Path
-import os, re, random
+from collections import Counter, OrderedDict
+from hashlib import blake2b
+import os, re, random, copy, json, atexit, asyncio, functools, threading
 
 # ---------- Optional OpenAI client ----------
 try:
-    from openai import OpenAI  # openai>=1.x
+    from openai import OpenAI, AsyncOpenAI  # openai>=1.x
     _HAS_OPENAI = True
 except Exception:
-    OpenAI = None
+    OpenAI = AsyncOpenAI = None
     _HAS_OPENAI = False
 
+# Cap on in-flight OpenAI requests for generate_many_async (stays under rate limits)
+OPENAI_MAX_CONCURRENCY = 16
+
+# Captions this short (or with no extractable facts) gain nothing from an LLM round-trip
+QUIZ_MIN_TOKENS_FOR_LLM = int(os.getenv("QUIZ_MIN_TOKENS_FOR_LLM", "4"))
+_GENERIC_CAPTIONS = frozenset({
+    "image","photo","picture","a photo","a picture","an image",
+    "a photo of something","a picture of something","an image of something",
+})
+
+# Decode steps between "have we parsed enough questions yet?" checks on the HF path
+HF_STOP_CHECK_EVERY = 16
+
+@functools.lru_cache(maxsize=1)
 def _use_openai_for_quiz() -> bool:
     prov = (os.getenv("QUIZ_PROVIDER") or "").strip().lower()
     return bool(os.getenv("OPENAI_API_KEY")) and prov == "openai" and _HAS_OPENAI
 
+# One client per process: keeps the connection pool (and TLS sessions) warm
+@functools.lru_cache(maxsize=1)
 def _openai_client():
     return OpenAI()  # pulls OPENAI_API_KEY from env
 
-# ---------- Robust parsers for the LLM output ----------
-_OPTION_RE   = re.compile(r'^([A-Ca-c])[\)\.:\-]\s*(.+)$')
-_QUESTION_RE = re.compile(r'^(\d+)[\)\.:\-]\s*(.+)$')
-_ANSWER_RE   = re.compile(r'^(?:Answer|Correct)\s*[:\-]\s*([A-Ca-c])\b')
-
-ANIMALS = {"dog","cat","bird","rabbit","horse","cow","sheep","goat","duck","fish"}
-PERSON_WORDS = {"man","woman","boy","girl","child","person","people"}
+@functools.lru_cache(maxsize=1)
+def _async_openai_client():
+    return AsyncOpenAI()
+
+# ---------- Shared HF pipelines ----------
+# Keyed by (task, device, model options); every QuizGenerator built without
+# shared_pipe reuses the same loaded model instead of loading its own copy.
+_PIPE_CACHE: dict = {}
+_PIPE_LOCK = threading.Lock()
+
+def _env_flag(name: str) -> bool:
+    return (os.getenv(name) or "").strip().lower() in {"1", "true", "yes", "on"}
+
+def _cached_pipeline(task: str, device: int, **opts):
+    key = (task, device, tuple(sorted(opts.items())))
+    with _PIPE_LOCK:
+        pipe = _PIPE_CACHE.get(key)
+        if pipe is None:
+            # On CPU the one-off export/compile cost outweighs the gain for these small models
+            pipe = _ort_pipeline(task, device, opts) if device >= 0 and _env_flag("QUIZ_ORT") else None
+            if pipe is None:
+                from transformers import pipeline  # type: ignore
+                pipe = pipeline(task, device=device, **opts)
+                if device >= 0:
+                    _accelerate(pipe)
+            _PIPE_CACHE[key] = pipe
+        return pipe
+
+def _accelerate(pipe) -> None:
+    """Best-effort GPU speedups on a loaded pipeline; any failure keeps the plain model."""
+    try:
+        # optional: fused attention kernels (pip install optimum)
+        from optimum.bettertransformer import BetterTransformer  # type: ignore
+        pipe.model = BetterTransformer.transform(pipe.model)
+    except Exception:
+        pass
+    if _env_flag("QUIZ_COMPILE"):
+        try:
+            import torch  # type: ignore
+            pipe.model = torch.compile(pipe.model, mode="reduce-overhead", dynamic=True)
+        except Exception:
+            pass
+
+def _ort_pipeline(task: str, device: int, opts: dict):
+    """The same pipeline around an ONNX Runtime export of the model; None if optimum is missing."""
+    try:
+        from optimum.onnxruntime import ORTModelForCausalLM, ORTModelForSeq2SeqLM  # type: ignore
+        from transformers import AutoTokenizer, pipeline  # type: ignore
+    except Exception:
+        return None
+    ort_cls = ORTModelForSeq2SeqLM if task == "text2text-generation" else ORTModelForCausalLM
+    load = {k: v for k, v in opts.items() if k == "local_files_only"}
+    try:
+        model = ort_cls.from_pretrained(opts["model"], export=True, provider="CUDAExecutionProvider", **load)
+        tok = AutoTokenizer.from_pretrained(opts["model"], **load)
+        return pipeline(task, model=model, tokenizer=tok, device=device)
+    except Exception:
+        return None
+
+def _gpu_dtype(torch, kind: str):
+    """Half-precision weights on CUDA: bf16 where supported, else fp16 (not for T5, which overflows)."""
+    if not torch.cuda.is_available():
+        return None
+    if torch.cuda.is_bf16_supported():
+        return torch.bfloat16
+    return None if kind == "flan" else torch.float16
+
+# Byte-identical on every call so the request prefix stays cacheable provider-side;
+# everything per-request (count, caption, hints) goes in the user message after it.
+_OPENAI_SYSTEM_PROMPT = (
+    "You turn a short image caption into the requested number of "
+    "kid-friendly MCQs. Each item has:\n"
+    "1) <question>\nA) <choice>\nB) <choice>\nC) <choice>\nAnswer: <A/B/C>\n"
+    "Rules: one clear sentence per question; 3 options only; one correct answer; "
+    "no explanations."
+)
 
-FRUITS = {
+# ---------- Robust parsers for the LLM output ----------
+# One match per line: "1) question" | "A) option" | "Answer: A" (the three never overlap)
+_LINE_RE = re.compile(
+    r'^(?:(?P<qn>\d+)[\)\.:\-]\s*(?P<q>.+)$'
+    r'|(?P<ol>[A-Ca-c])[\)\.:\-]\s*(?P<o>.+)$'
+    r'|(?:Answer|Correct)\s*[:\-]\s*(?P<a>[A-Ca-c])\b)'
+)
+_LINE_FIRST = frozenset("ABCabc")
+
+# ---------- Caption fact patterns (compiled once) ----------
+# One pattern per preposition, tried in priority order: "near the tree" wins over
+# an earlier "on the grass", which a single leftmost alternation would not do.
+_PREP_RES = tuple(
+    (prep, re.compile(rf"\b{prep}\s+([a-z0-9' \-]+)"))
+    for prep in ("around","near","beside","by","on","in","at","under","inside")
+)
+_OBJECTS_HINT_RE = re.compile(r"\b(?:objects?|labels?)\s*[:\-]\s*(.+)$", re.I)
+_OBJECTS_SPLIT_RE = re.compile(r",|\band\b|/|\|")
+_WS_RE = re.compile(r"\s+")
+
+ANIMALS = frozenset({"dog","cat","bird","rabbit","horse","cow","sheep","goat","duck","fish"})
+PERSON_WORDS = frozenset({"man","woman","boy","girl","child","person","people"})
+
+FRUITS = frozenset({
     "apple","banana","orange","mango","grape","strawberry","pineapple",
     "watermelon","lemon","lime","pear","peach","cherry","tomato","coconut",
     "papaya","guava","kiwi","plum","pomegranate","avocado"
+})
+VEHICLES = frozenset({"car","bus","bicycle","train","boat","airplane","truck","motorcycle","van","ship"})
+FURNITURE = frozenset({"chair","table","bed","sofa","lamp"})
+BIRDS = frozenset({"bird","eagle","owl","penguin","parrot","peacock","duck","chicken","seagull","sparrow","pigeon","crow","flamingo"})
+FISH  = frozenset({"fish","whale","dolphin","goldfish","salmon","shark","ray"})
+PLACES = frozenset({"park","beach","kitchen","classroom","forest","street","playground","garden","farm","room","table"})
+
+# Words that can't be the caption's main "object"
+_STOP = PERSON_WORDS | ANIMALS | frozenset({"a","an","the","and","of","to","with","without","while","on","in","at","near","by","around","beside"})
+
+# Caption token -> (fact, value) in one lookup; plurals map to the singular animal
+_FACT_WORDS = {
+    **{w + "s": ("animal", w) for w in ANIMALS},
+    **{w: ("animal", w) for w in ANIMALS},
+    **{w: ("who", w) for w in PERSON_WORDS},
+}
+
+# Category of a word for the "mostly what?" question (the three sets are disjoint)
+_CATEGORY_NAMES = ("Fruits", "Animals", "Vehicles")
+_CATEGORY_OF = {
+    **{w: "Fruits" for w in FRUITS},
+    **{w: "Animals" for w in ANIMALS},
+    **{w: "Vehicles" for w in VEHICLES},
 }
-VEHICLES = {"car","bus","bicycle","train","boat","airplane","truck","motorcycle","van","ship"}
-FURNITURE = {"chair","table","bed","sofa","lamp"}
-BIRDS = {"bird","eagle","owl","penguin","parrot","peacock","duck","chicken","seagull","sparrow","pigeon","crow","flamingo"}
-FISH  = {"fish","whale","dolphin","goldfish","salmon","shark","ray"}
-PLACES = {"park","beach","kitchen","classroom","forest","street","playground","garden","farm","room","table"}
+
+# ---------- Response / fact caches ----------
+# LLM answers keyed by (caption hash, expected, model kind); classroom reuse of the
+# same caption then skips the OpenAI/HF round-trip. Dynamic fallbacks are cheap and
+# not cached, so a transient LLM failure doesn't stick.
+QUIZ_CACHE_MAX = 512
+_CacheKey = Tuple[str, int, str]
 
 def _llm_kind() -> str:
     v = (os.getenv("QUIZGEN_MODEL") or "").strip().lower()
     return "gpt2" if v in {"gpt2","distilgpt2"} else "flan"  # default flan
 
+# Distractor pools, fixed order so a seeded rng picks the same words in every process
+_ALL_OBJECTS = tuple(sorted(ANIMALS | FRUITS | VEHICLES | FURNITURE | BIRDS | FISH))
+_ALL_ACTIONS = ("Sleeping", "Running", "Drawing", "Reading", "Dancing", "Singing", "Jumping", "Playing")
+_PICK_PHRASES = ("Which item do you see", "Pick something you can spot", "Which is present in the picture")
+
+def _sample_excluding(rng: random.Random, pool: Tuple[str, ...], skip: str, k: int) -> List[str]:
+    """k distinct items of `pool` other than `skip`, without copying the pool."""
+    picks = rng.sample(pool, k + 1)
+    return [w for w in picks if w != skip][:k]
+
+# ---------- Randomness ----------
+# Mersenne Twister stays: its C draws are several times cheaper per call than
+# numpy's Generator or SystemRandom at the one-or-two draws each question makes.
+def _make_rng() -> random.Random:
+    seed = (os.getenv("QUIZ_SEED") or "1337").strip().lower()
+    if seed in {"random", "system", "none"}:
+        return random.Random()  # seeded once from os.urandom
+    try:
+        return random.Random(int(seed))
+    except ValueError:
+        return random.Random(seed)
+
+# ---------- Option shuffling ----------
+# Every question has exactly three options: pick one of the 6 orders with one draw
+_PERM3 = ((0,1,2), (0,2,1), (1,0,2), (1,2,0), (2,0,1), (2,1,0))
+
+def _permute3(rng: random.Random, opts: List[str], answer_index: int) -> Tuple[List[str], int]:
+    """Shuffle three options; returns (options, new index of the answer)."""
+    p = _PERM3[rng.randrange(6)]
+    return [opts[i] for i in p], p.index(answer_index)
+
+# ---------- Caption facts (pure of the caption, so memoized) ----------
+@functools.lru_cache(maxsize=1024)
+def _caption_facts(caption: str) -> dict:
+    """
+    Lightweight cues from a short caption (no heavy NLP deps):
+    - who / animal
+    - action (first -ing verb)
+    - where (preposition + object)
+    - object (first noun-ish token not in stoplist)
+    - objects: from trailing hints like "Objects: a, b, c" or "Labels: ..."
+    """
+    tl = (caption or "").strip().lower()
+    tokens = [w.strip(".,!?:;") for w in tl.split() if w]
+
+    # One pass for who/animal/action/object, stopping once all four are found
+    who = animal = action = obj = None
+    for w in tokens:
+        hit = _FACT_WORDS.get(w)
+        if hit is not None:
+            if hit[0] == "who":
+                if who is None:
+                    who = hit[1]
+            elif animal is None:
+                animal = hit[1]
+            if w in _STOP:
+                continue  # people and singular animals are never the action or object
+        if w.endswith("ing"):
+            if action is None:
+                action = w
+        elif obj is None and w not in _STOP:
+            obj = w
+        if who is not None and animal is not None and action is not None and obj is not None:
+            break
+
+    where_raw = None
+    for prep, prep_re in _PREP_RES:
+        m = prep_re.search(tl)
+        if m:
+            where_raw = f"{prep} " + m.group(1).strip()
+            break
+
+    where = where_raw
+    if where and len(where.split()) > 6:
+        where = " ".join(where.split()[:6])
+
+    objects_list: List[str] = []
+    try:
+        m = _OBJECTS_HINT_RE.search(tl)
+        if m:
+            tail = m.group(1)
+            parts = _OBJECTS_SPLIT_RE.split(tail)
+            objects_list = [p.strip().strip(" .!") for p in parts if p and p.strip()]
+    except Exception:
+        objects_list = []
+
+    return {
+        "who": who,
+        "animal": animal,
+        "action": action,
+        "where_raw": where_raw,
+        "where": where,
+        "object": obj,
+        "objects": objects_list,
+    }
+
+
 class QuizGenerator:
     def __init__(self, model_root: Path | None = None, shared_pipe=None):
         self.err: Optional[str] = None
         self._pipe = shared_pipe
         self._device = -1
-        self._rng = random.Random(1337)
+        self._rng = _make_rng()
         self.kind = _llm_kind()
         self.ready = shared_pipe is not None
+        self._cache: "OrderedDict[_CacheKey, List[dict]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._cache_path = (os.getenv("QUIZ_CACHE_PATH") or "").strip() or None
+        if self._cache_path:
+            self._load_cache()
+            atexit.register(self._save_cache)
         if not self.ready:
             self._try_load(model_root)
 
+    # ---------------- response cache ----------------
+    def _cache_key(self, caption: str, expected: int, image_hash: Optional[str] = None) -> _CacheKey:
+        # The same image can come back with a slightly different caption (casing,
+        # whitespace, a re-run captioner), so an upstream image hash keys first.
+        if image_hash:
+            return ("img:" + str(image_hash)[:128], expected, self.kind)
+        return (blake2b(caption.encode("utf-8"), digest_size=16).hexdigest(), expected, self.kind)
+
+    def _cache_get(self, key: _CacheKey) -> Optional[List[dict]]:
+        with self._cache_lock:
+            hit = self._cache.get(key)
+            if hit is None:
+                self._cache_stats["misses"] += 1
+                return None
+            self._cache_stats["hits"] += 1
+            self._cache.move_to_end(key)
+        return copy.deepcopy(hit)  # callers may mutate their questions
+
+    def _remember(self, key: _CacheKey, questions: List[dict]) -> List[dict]:
+        with self._cache_lock:
+            self._cache[key] = copy.deepcopy(questions)
+            self._cache.move_to_end(key)
+            while len(self._cache) > QUIZ_CACHE_MAX:
+                self._cache.popitem(last=False)
+                self._cache_stats["evictions"] += 1
+        return questions
+
+    def cache_stats(self) -> dict:
+        """Response-cache counters since startup, for sizing QUIZ_CACHE_MAX."""
+        with self._cache_lock:
+            return {**self._cache_stats, "size": len(self._cache), "max": QUIZ_CACHE_MAX}
+
+    def _load_cache(self) -> None:
+        try:
+            with open(self._cache_path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+            for h, n, kind, qs in rows[-QUIZ_CACHE_MAX:]:
+                self._cache[(str(h), int(n), str(kind))] = qs
+        except Exception:
+            pass  # missing/corrupt file: start empty
+
+    def _save_cache(self) -> None:
+        try:
+            with self._cache_lock:
+                rows = [[h, n, kind, qs] for (h, n, kind), qs in self._cache.items()]
+            path = Path(self._cache_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            tmp.write_text(json.dumps(rows, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+        except Exception:
+            pass
+
     # ---------------- model loading ----------------
     def _try_load(self, model_root: Path | None) -> None:
         """
@@ -101,14 +398,15 @@ class QuizGenerator:
                 return
 
             import torch  # type: ignore
-            from transformers import pipeline  # type: ignore
 
             self._device = 0 if torch.cuda.is_available() else -1
+            dtype = _gpu_dtype(torch, self.kind)
+            load_opts = {"torch_dtype": dtype} if dtype is not None else {}
 
             if self.kind == "flan":
                 # small + fast; override with QUIZGEN_FLAN_MODEL if needed
                 model_name = os.getenv("QUIZGEN_FLAN_MODEL", "google/flan-t5-small")
-                self._pipe = pipeline("text2text-generation", model=model_name, device=self._device)
+                self._pipe = _cached_pipeline("text2text-generation", self._device, model=model_name, **load_opts)
             else:
                 # GPT-2 family fallback
                 candidates: list[dict] = []
@@ -120,10 +418,9 @@ class QuizGenerator:
                 candidates.append({"model": "distilgpt2"})
 
                 last_err: Exception | None = None
-                from transformers import pipeline as _pipe  # type: ignore
                 for opts in candidates:
                     try:
-                        self._pipe = _pipe("text-generation", device=self._device, framework="pt", **opts)
+                        self._pipe = _cached_pipeline("text-generation", self._device, framework="pt", **opts, **load_opts)
                         last_err = None
                         break
                     except Exception as e:
@@ -140,20 +437,28 @@ class QuizGenerator:
                         + "; install transformers/torch or switch model.")
 
     # ---------------- public API ----------------
-    def generate(self, caption: str, num_questions: int = 3) -> List[dict]:
+    def generate(self, caption: str, num_questions: int = 3, image_hash: Optional[str] = None) -> List[dict]:
         caption = (caption or "").strip()
         if not caption:
             raise ValueError("empty_caption")
 
         expected = max(1, min(3, int(num_questions or 3)))
 
+        key = self._cache_key(caption, expected, image_hash)
+        hit = self._cache_get(key)
+        if hit is not None:
+            return hit
+
         # Precompute facts for grounding (used by all paths)
         facts = self._extract_facts(caption)
+        quick = self._dynamic_shortcut(caption, expected, facts)
+        if quick is not None:
+            return quick
 
         # OpenAI path (preferred when configured)
         if self.ready and self._pipe == "openai" and _use_openai_for_quiz():
             try:
-                return self._openai_questions(caption, expected, facts)
+                return self._remember(key, self._openai_questions(caption, expected, facts))
             except Exception:
                 # fall back to HF or dynamic
                 pass
@@ -161,52 +466,121 @@ class QuizGenerator:
         # HF fallback path
         if self.ready and self._pipe is not None:
             try:
-                return self._hf_llm_questions(caption, expected, facts)
+                return self._remember(key, self._hf_llm_questions(caption, expected, facts))
             except Exception:
                 return self._dynamic_questions(caption, expected, facts)
 
         # Dynamic fallback
         return self._dynamic_questions(caption, expected, facts)
 
+    async def generate_async(self, caption: str, num_questions: int = 3, image_hash: Optional[str] = None) -> List[dict]:
+        """
+        generate() for async callers. The OpenAI path awaits the request on the
+        event loop, so many quizzes can be in flight at once; the HF/dynamic paths
+        run generate() on a worker thread.
+        """
+        if not (self.ready and self._pipe == "openai" and _use_openai_for_quiz()):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.generate, caption, num_questions, image_hash)
+
+        caption = (caption or "").strip()
+        if not caption:
+            raise ValueError("empty_caption")
+
+        expected = max(1, min(3, int(num_questions or 3)))
+
+        key = self._cache_key(caption, expected, image_hash)
+        hit = self._cache_get(key)
+        if hit is not None:
+            return hit
+
+        facts = self._extract_facts(caption)
+        quick = self._dynamic_shortcut(caption, expected, facts)
+        if quick is not None:
+            return quick
+        try:
+            return self._remember(key, await self._openai_questions_async(caption, expected, facts))
+        except Exception:
+            return self._dynamic_questions(caption, expected, facts)
+
+    async def generate_many_async(self, captions: List[str], num_questions: int = 3) -> List[List[dict]]:
+        """Bulk generate_async(): all captions concurrently, at most OPENAI_MAX_CONCURRENCY at a time."""
+        sem = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+
+        async def one(c: str) -> List[dict]:
+            async with sem:
+                return await self.generate_async(c, num_questions)
+
+        return list(await asyncio.gather(*(one(c) for c in captions)))
+
     # ---------------- OpenAI path ----------------
+    # Both paths stream and hang up as soon as `expected` complete questions parse,
+    # so tokens the model writes past the quiz are never waited for.
     def _openai_questions(self, caption: str, expected: int, facts: dict) -> List[dict]:
-        client = _openai_client()
+        stream = _openai_client().chat.completions.create(stream=True, **self._openai_request(caption, expected, facts))
+        text = ""
+        try:
+            for chunk in stream:
+                piece = self._delta_text(chunk)
+                text += piece
+                if self._quiz_complete(text, piece, expected):
+                    break
+        finally:
+            stream.close()
+        return self._openai_finish(text, caption, expected, facts)
+
+    async def _openai_questions_async(self, caption: str, expected: int, facts: dict) -> List[dict]:
+        stream = await _async_openai_client().chat.completions.create(stream=True, **self._openai_request(caption, expected, facts))
+        text = ""
+        try:
+            async for chunk in stream:
+                piece = self._delta_text(chunk)
+                text += piece
+                if self._quiz_complete(text, piece, expected):
+                    break
+        finally:
+            await stream.close()
+        return self._openai_finish(text, caption, expected, facts)
+
+    @staticmethod
+    def _delta_text(chunk) -> str:
+        choices = getattr(chunk, "choices", None)
+        return (choices[0].delta.content or "") if choices else ""
+
+    def _quiz_complete(self, text: str, piece: str, expected: int) -> bool:
+        # A block can only have completed when a line just ended; parse finished lines only
+        if "\n" not in piece:
+            return False
+        return len(self._parse_output(text[:text.rfind("\n")], expected)) >= expected
+
+    def _openai_request(self, caption: str, expected: int, facts: dict) -> dict:
         model = os.getenv("QUIZ_OPENAI_MODEL", "gpt-4o-mini")
         prompt_caption = caption[:240]
         hint_line = self._facts_hint_line(facts)
 
-        system = (
-            "You turn a short image caption into EXACTLY "
-            f"{expected} kid-friendly MCQs. Each item has:\n"
-            "1) <question>\nA) <choice>\nB) <choice>\nC) <choice>\nAnswer: <A/B/C>\n"
-            "Rules: one clear sentence per question; 3 options only; one correct answer; "
-            "no explanations."
-        )
         user = (
             f'Caption: "{prompt_caption}".\n{hint_line}\n'
-            "Write the quiz now in the exact format."
+            f"Write EXACTLY {expected} questions now in the exact format."
         )
 
-        resp = client.chat.completions.create(
+        return dict(
             model=model,
             temperature=0.6,
             max_tokens=400,
             messages=[
-                {"role": "system", "content": system},
+                {"role": "system", "content": _OPENAI_SYSTEM_PROMPT},
                 {"role": "user", "content": user},
             ],
         )
-        text = (resp.choices[0].message.content or "").strip()
+
+    def _openai_finish(self, text: str, caption: str, expected: int, facts: dict) -> List[dict]:
+        text = text.strip()
         parsed = self._parse_output(text, expected)
 
         if len(parsed) >= expected:
             # Randomize options but preserve correctness
             for item in parsed:
-                opts = item["options"][:3]
-                correct = opts[item["answer_index"]]
-                self._rng.shuffle(opts)
-                item["options"] = opts
-                item["answer_index"] = opts.index(correct)
+                item["options"], item["answer_index"] = _permute3(self._rng, item["options"][:3], item["answer_index"])
             return parsed[:expected]
 
         # If parsing failed, revert to dynamic generation
@@ -217,8 +591,18 @@ class QuizGenerator:
         from transformers import set_seed  # type: ignore
 
         set_seed(self._rng.randint(0, 10_000_000))
+        prompt, gen_kwargs = self._hf_request(caption, expected, facts)
+        stop = self._hf_stopping(prompt, expected)
+        if stop is not None:
+            gen_kwargs["stopping_criteria"] = stop
+        out = self._pipe(prompt, **gen_kwargs)
+        return self._hf_finish(self._hf_text(out), caption, expected, facts)
+
+    def _hf_request(self, caption: str, expected: int, facts: dict):
+        """Prompt + generation kwargs for one caption (shared by single and batched calls)."""
         prompt_caption = caption[:240]
         hint_line = self._facts_hint_line(facts)
+        eos_token_id = getattr(getattr(self._pipe, "tokenizer", None), "eos_token_id", None)
 
         if self.kind == "flan":
             # Instruction for text2text models (FLAN)
@@ -239,9 +623,7 @@ class QuizGenerator:
                 "Answer: B\n\n"
                 "Now the quiz:\n"
             )
-            eos_token_id = getattr(getattr(self._pipe, "tokenizer", None), "eos_token_id", None)
-            out = self._pipe(
-                prompt,
+            return prompt, dict(
                 max_new_tokens=220,
                 do_sample=True,
                 temperature=0.7,
@@ -250,46 +632,139 @@ class QuizGenerator:
                 return_full_text=False,
                 eos_token_id=eos_token_id,
             )
-            text = (out[0].get("generated_text") or out[0].get("text") or "") if isinstance(out, list) and out else ""
-        else:
-            # GPT-2 style (text-generation)
-            prompt = (
-                "Create multiple-choice questions from the caption.\n"
-                f'Caption: "{prompt_caption}"\n'
-                f"{hint_line}\n"
-                f"Write exactly {expected} questions. For each question use this exact format:\n"
-                "1) <question>\n"
-                "A) <choice>\n"
-                "B) <choice>\n"
-                "C) <choice>\n"
-                "Answer: <A/B/C>\n\n"
-                "Now the quiz:\n"
-            )
-            eos_token_id = getattr(getattr(self._pipe, "tokenizer", None), "eos_token_id", None)
-            out = self._pipe(
-                prompt,
-                max_new_tokens=260,
-                do_sample=True,
-                temperature=0.8,
-                top_p=0.92,
-                repetition_penalty=1.1,
-                eos_token_id=eos_token_id,
-            )
-            text = (out[0].get("generated_text") or out[0].get("text") or "") if isinstance(out, list) and out else ""
 
-        parsed = self._parse_output(str(text), expected)
+        # GPT-2 style (text-generation)
+        prompt = (
+            "Create multiple-choice questions from the caption.\n"
+            f'Caption: "{prompt_caption}"\n'
+            f"{hint_line}\n"
+            f"Write exactly {expected} questions. For each question use this exact format:\n"
+            "1) <question>\n"
+            "A) <choice>\n"
+            "B) <choice>\n"
+            "C) <choice>\n"
+            "Answer: <A/B/C>\n\n"
+            "Now the quiz:\n"
+        )
+        return prompt, dict(
+            max_new_tokens=260,
+            do_sample=True,
+            temperature=0.8,
+            top_p=0.92,
+            repetition_penalty=1.1,
+            eos_token_id=eos_token_id,
+        )
+
+    def _hf_stopping(self, prompt: str, expected: int):
+        """
+        StoppingCriteriaList that ends generation once `expected` questions parse from
+        the new tokens (checked every HF_STOP_CHECK_EVERY steps). None if unavailable.
+        """
+        tok = getattr(self._pipe, "tokenizer", None)
+        if tok is None:
+            return None
+        try:
+            import torch  # type: ignore
+            from transformers import StoppingCriteria, StoppingCriteriaList  # type: ignore
+        except Exception:
+            return None
+
+        # text-generation echoes the prompt in input_ids; seq2seq decoder ids start fresh
+        start = 0 if self.kind == "flan" else len(tok(prompt)["input_ids"])
+        parse = self._parse_output
+
+        class _QuizComplete(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                n = input_ids.shape[-1] - start
+                done = False
+                if n > 0 and n % HF_STOP_CHECK_EVERY == 0:
+                    text = tok.decode(input_ids[0, start:], skip_special_tokens=True)
+                    done = len(parse(text[:text.rfind("\n")], expected)) >= expected
+                return torch.full((input_ids.shape[0],), done, dtype=torch.bool, device=input_ids.device)
+
+        return StoppingCriteriaList([_QuizComplete()])
+
+    @staticmethod
+    def _hf_text(out) -> str:
+        # text-generation nests one list per prompt; text2text returns the dicts directly
+        if isinstance(out, list) and out and isinstance(out[0], list):
+            out = out[0]
+        if isinstance(out, list) and out:
+            return str(out[0].get("generated_text") or out[0].get("text") or "")
+        if isinstance(out, dict):
+            return str(out.get("generated_text") or out.get("text") or "")
+        return ""
+
+    def _hf_finish(self, text: str, caption: str, expected: int, facts: dict) -> List[dict]:
+        parsed = self._parse_output(text, expected)
 
         if len(parsed) >= expected:
             for item in parsed:
-                opts = item["options"][:3]
-                correct = opts[item["answer_index"]]
-                self._rng.shuffle(opts)
-                item["options"] = opts
-                item["answer_index"] = opts.index(correct)
+                item["options"], item["answer_index"] = _permute3(self._rng, item["options"][:3], item["answer_index"])
             return parsed[:expected]
 
         return self._dynamic_questions(caption, expected, facts)
 
+    # ---------------- batched entry point ----------------
+    @property
+    def batches_locally(self) -> bool:
+        """True when generation runs on the local HF pipeline (the path batching helps)."""
+        return bool(self.ready and self._pipe is not None and self._pipe != "openai")
+
+    def generate_many(self, captions: List[str], num_questions: int = 3,
+                      image_hashes: Optional[List[Optional[str]]] = None) -> List[List[dict]]:
+        """
+        generate() for several captions. On the HF path all cache misses go through
+        ONE pipeline call (batch_size=len), so per-call tokenizer/kernel overhead is
+        paid once per batch instead of once per caption.
+        """
+        hashes = list(image_hashes or [None] * len(captions))
+        if not self.batches_locally:
+            return [self.generate(c, num_questions, h) for c, h in zip(captions, hashes)]
+
+        expected = max(1, min(3, int(num_questions or 3)))
+        results: List[Optional[List[dict]]] = [None] * len(captions)
+        todo = []
+        for i, (c, h) in enumerate(zip(captions, hashes)):
+            c = (c or "").strip()
+            if not c:
+                raise ValueError("empty_caption")
+            key = self._cache_key(c, expected, h)
+            hit = self._cache_get(key)
+            facts = None if hit is not None else self._extract_facts(c)
+            if hit is not None:
+                results[i] = hit
+            else:
+                results[i] = self._dynamic_shortcut(c, expected, facts)
+                if results[i] is None:
+                    todo.append((i, c, key, facts))
+
+        if todo:
+            try:
+                from transformers import set_seed  # type: ignore
+
+                self._prepare_batching()
+                set_seed(self._rng.randint(0, 10_000_000))
+                reqs = [self._hf_request(c, expected, facts) for _, c, _, facts in todo]
+                outs = self._pipe([p for p, _ in reqs], batch_size=len(reqs), **reqs[0][1])
+                for (i, c, key, facts), out in zip(todo, outs):
+                    results[i] = self._remember(key, self._hf_finish(self._hf_text(out), c, expected, facts))
+            except Exception:
+                for i, c, _, facts in todo:
+                    if results[i] is None:
+                        results[i] = self._dynamic_questions(c, expected, facts)
+
+        return results  # type: ignore[return-value]
+
+    def _prepare_batching(self) -> None:
+        # Decoder-only models must pad on the left, or sampling continues from pad tokens
+        tok = getattr(self._pipe, "tokenizer", None)
+        if tok is None or self.kind == "flan":
+            return
+        tok.padding_side = "left"
+        if getattr(tok, "pad_token_id", None) is None:
+            tok.pad_token = tok.eos_token
+
     # ---------------- parsing ----------------
     def _parse_output(self, raw: str, expected: int) -> List[dict]:
         lines = [line.strip() for line in raw.splitlines()]
@@ -297,31 +772,32 @@ class QuizGenerator:
         current: Optional[dict] = None
 
         for line in lines:
-            if not line:
+            # every line _LINE_RE accepts starts with a digit or A/B/C (incl. Answer/Correct)
+            if not line or not (line[0] in _LINE_FIRST or line[0].isdigit()):
+                continue
+
+            m = _LINE_RE.match(line)
+            if m is None:
                 continue
 
-            q_match = _QUESTION_RE.match(line)
-            if q_match:
+            if m.group("qn") is not None:
                 if current and len(current.get("options", [])) >= 3 and current.get("answer") is not None:
                     items.append(current)
-                current = {"question": q_match.group(2).strip(), "options": [], "answer": None}
+                current = {"question": m.group("q").strip(), "options": [], "answer": None}
                 continue
 
             if current is None:
                 continue
 
-            opt_match = _OPTION_RE.match(line)
-            if opt_match:
+            if m.group("ol") is not None:
                 if len(current["options"]) < 3:
-                    current["options"].append(opt_match.group(2).strip())
+                    current["options"].append(m.group("o").strip())
                 continue
 
-            ans_match = _ANSWER_RE.match(line)
-            if ans_match:
-                try:
-                    current["answer"] = "ABC".index(ans_match.group(1).upper())
-                except ValueError:
-                    current["answer"] = None
+            try:
+                current["answer"] = "ABC".index(m.group("a").upper())
+            except ValueError:
+                current["answer"] = None
 
         if current and len(current.get("options", [])) >= 3 and current.get("answer") is not None:
             items.append(current)
@@ -357,47 +833,38 @@ class QuizGenerator:
         seen = set(); objects_list = [o for o in objects_list if not (o in seen or seen.add(o))]
 
         def _uniq3(correct: str, wrongs: List[str]) -> List[str]:
-            seen = set(); opts = []
-            for o in [correct] + list(wrongs):
-                k = (o or "").strip().lower()
-                if not k or k in seen:
-                    continue
-                seen.add(k); opts.append(o)
-                if len(opts) == 3: break
-            fillers = ["Something else", "Not sure", "I forget"]
-            for f in fillers:
-                if len(opts) == 3: break
-                if f.lower() not in seen:
-                    seen.add(f.lower()); opts.append(f)
-            return opts[:3]
+            # first spelling of each option wins; fillers only top up to three.
+            # A non-empty `correct` is inserted first, so it is always opts[0].
+            seen: dict = {}
+            for o in (correct, *wrongs, "Something else", "Not sure", "I forget"):
+                k = (o or "").strip().casefold()
+                if k:
+                    seen.setdefault(k, o)
+            return list(seen.values())[:3]
 
         used_q = set()
         def _norm_q(q: str) -> str:
-            return re.sub(r"\s+", " ", (q or "").strip().rstrip(" ?!.")).lower()
+            return _WS_RE.sub(" ", (q or "").strip().rstrip(" ?!.")).lower()
 
         def add(q: str, correct: str, wrongs: List[str]) -> None:
             key = _norm_q(q)
-            if not key or key in used_q:
-                return
-            opts = _uniq3(correct, wrongs)
-            if (correct or "").strip() and all((o.strip().lower() != correct.strip().lower()) for o in opts):
-                opts[0] = correct
-            rng.shuffle(opts)
+            if not key or key in used_q or not (correct or "").strip():
+                return  # no answer means no question, rather than a quiz item marked wrong
+            opts, ans = _permute3(rng, _uniq3(correct, wrongs), 0)
             questions.append({
                 "question": q if q.strip().endswith("?") else (q.strip() + "?"),
                 "options": opts,
-                "answer_index": opts.index(next(o for o in opts if o.strip().lower() == correct.strip().lower())) if correct.strip() else 0,
+                "answer_index": ans,
             })
             used_q.add(key)
 
         questions: List[dict] = []
+        present_set = frozenset(objects_list)
+        absent = [w for w in _ALL_OBJECTS if w not in present_set]   # distractor pool, built once
 
         if objects_list:
-            present = objects_list[:]
-            correct = present[rng.randrange(len(present))].capitalize()
-            pool = list((ANIMALS | FRUITS | VEHICLES | FURNITURE | BIRDS | FISH) - set(present))
-            rng.shuffle(pool)
-            wrongs = [w.capitalize() for w in pool[:2]] if len(pool) >= 2 else ["Robot", "Spaceship"]
+            correct = rng.choice(objects_list).capitalize()
+            wrongs = [w.capitalize() for w in rng.sample(absent, 2)] if len(absent) >= 2 else ["Robot", "Spaceship"]
             add("Which of these is in the picture", correct, wrongs)
 
         if where_raw or where:
@@ -409,10 +876,8 @@ class QuizGenerator:
         if action:
             subj = (who or animal or (objects_list[0].capitalize() if objects_list else "character"))
             correct = action.capitalize()
-            action_pool = ["Sleeping", "Running", "Drawing", "Reading", "Dancing", "Singing", "Jumping", "Playing"]
-            action_pool = [a for a in action_pool if a.lower() != action.lower()]
-            rng.shuffle(action_pool)
-            wrongs = action_pool[:2] if len(action_pool) >= 2 else ["Sleeping", "Running"]
+            action_pool = [a for a in _ALL_ACTIONS if a.lower() != action.lower()]
+            wrongs = rng.sample(action_pool, 2) if len(action_pool) >= 2 else ["Sleeping", "Running"]
             add(f"What is the {subj} doing?", correct, wrongs)
 
         if len(questions) < expected:
@@ -425,34 +890,29 @@ class QuizGenerator:
                 add("What is shown in the picture?", correct, ["A rocket in space.", "Nothing at all."])
 
         if len(questions) < expected and len(objects_list) >= 2:
-            present = objects_list[:]
-            pool = list((ANIMALS | FRUITS | VEHICLES | FURNITURE | BIRDS | FISH) - set(present))
-            rng.shuffle(pool)
-            not_there = (pool[0] if pool else "spaceship").capitalize()
-            wrongs = [present[0].capitalize(), present[1].capitalize()]
+            not_there = (rng.choice(absent) if absent else "spaceship").capitalize()
+            wrongs = [objects_list[0].capitalize(), objects_list[1].capitalize()]
             add("Which of these is NOT in the picture?", not_there, wrongs)
 
         if len(questions) < expected:
-            cats = {"Fruits": FRUITS, "Animals": ANIMALS, "Vehicles": VEHICLES}
-            counts = {k: 0 for k in cats}
-            for o in objects_list:
-                lo = o.lower()
-                for cname, cset in cats.items():
-                    if lo in cset: counts[cname] += 1
-            if counts and max(counts.values()) >= 2:
-                best_cat = max(counts.items(), key=lambda kv: kv[1])[0]
-                other = [c for c in cats.keys() if c != best_cat]
-                self._rng.shuffle(other)
-                add("These things are mostly what?", best_cat, other[:2])
-
-        while len(questions) < expected:
+            counts = Counter(c for c in map(_CATEGORY_OF.get, objects_list) if c)
+            best = counts.most_common(1)
+            if best and best[0][1] >= 2:
+                best_cat = best[0][0]
+                other = [c for c in _CATEGORY_NAMES if c != best_cat]
+                add("These things are mostly what?", best_cat, other)  # add() shuffles the options
+
+        # add() drops repeated questions, so bound the retries instead of spinning forever
+        # (a caption with no objects only has one question left to offer here)
+        for _ in range(12):
+            if len(questions) >= expected:
+                break
             if objects_list:
-                pool = list(objects_list); rng.shuffle(pool)
-                correct = pool[0].capitalize()
-                distract = list((ANIMALS | FRUITS | VEHICLES | FURNITURE | BIRDS | FISH) - {pool[0]})
-                rng.shuffle(distract)
-                wrongs = [distract[0].capitalize(), distract[1].capitalize()] if len(distract) >= 2 else ["Robot", "Spaceship"]
-                phr = rng.choice(["Which item do you see", "Pick something you can spot", "Which is present in the picture"])
+                pick = rng.choice(objects_list)
+                correct = pick.capitalize()
+                # every other known object is fair game, as long as it isn't the answer itself
+                wrongs = [w.capitalize() for w in _sample_excluding(rng, _ALL_OBJECTS, pick, 2)]
+                phr = rng.choice(_PICK_PHRASES)
                 add(phr, correct, wrongs)
             else:
                 add("How does the scene feel", "Calm and friendly.", ["Very scary.", "As loud as a concert."])
@@ -480,57 +940,30 @@ class QuizGenerator:
         return w[:1].upper() + w[1:] if w else "A familiar place"
 
     def _extract_facts(self, caption: str) -> dict:
-        """
-        Lightweight cues from a short caption (no heavy NLP deps):
-        - who / animal
-        - action (first -ing verb)
-        - where (preposition + object)
-        - object (first noun-ish token not in stoplist)
-        - objects: from trailing hints like "Objects: a, b, c" or "Labels: ..."
-        """
-        tl = (caption or "").strip().lower()
-        tokens = [w.strip(".,!?:;") for w in tl.split() if w]
-
-        who = next((w for w in tokens if w in PERSON_WORDS), None)
-        animal = next((
-            w[:-1] if (w.endswith("s") and w[:-1] in ANIMALS) else w
-            for w in tokens if (w in ANIMALS or (w.endswith("s") and w[:-1] in ANIMALS))
-        ), None)
-        action = next((w for w in tokens if w.endswith("ing")), None)
-
-        where_raw = None
-        for prep in ["around","near","beside","by","on","in","at","under","inside"]:
-            m = re.search(rf"\b{prep}\s+([a-z0-9' \-]+)", tl)
-            if m:
-                where_raw = f"{prep} " + m.group(1).strip()
-                break
+        """Facts are a pure function of the caption; memoized in _caption_facts."""
+        facts = _caption_facts(caption or "")
+        return {**facts, "objects": list(facts["objects"])}
 
-        stop = PERSON_WORDS | ANIMALS | {"a","an","the","and","of","to","with","without","while","on","in","at","near","by","around","beside"}
-        obj = next((w for w in tokens if w not in stop and not w.endswith("ing")), None)
 
-        where = where_raw
-        if where and len(where.split()) > 6:
-            where = " ".join(where.split()[:6])
-
-        objects_list: List[str] = []
-        try:
-            m = re.search(r"\b(?:objects?|labels?)\s*[:\-]\s*(.+)$", tl, flags=re.I)
-            if m:
-                tail = m.group(1)
-                parts = re.split(r",|\band\b|/|\|", tail)
-                objects_list = [p.strip().strip(" .!") for p in parts if p and p.strip()]
-        except Exception:
-            objects_list = []
-
-        return {
-            "who": who,
-            "animal": animal,
-            "action": action,
-            "where_raw": where_raw,
-            "where": where,
-            "object": obj,
-            "objects": objects_list,
-        }
+    @staticmethod
+    def _worth_llm(caption: str, facts: dict) -> bool:
+        """False for captions the dynamic generator answers as well as an LLM would."""
+        if len(caption.split()) < QUIZ_MIN_TOKENS_FOR_LLM:
+            return False
+        if caption.lower().strip(" .!?") in _GENERIC_CAPTIONS:
+            return False
+        # no person/animal/action/place/objects: an LLM only invents unrelated content
+        return any(facts.get(k) for k in ("who", "animal", "action", "where_raw", "objects"))
+
+    def _dynamic_shortcut(self, caption: str, expected: int, facts: dict) -> Optional[List[dict]]:
+        """
+        The dynamic quiz for a caption not worth an LLM call, but only when it fills all
+        `expected` questions; None sends the caption down the LLM path as usual.
+        """
+        if self._worth_llm(caption, facts):
+            return None
+        qs = self._dynamic_questions(caption, expected, facts)
+        return qs if len(qs) == expected else None
 
     def _facts_hint_line(self, facts: dict) -> str:
         who = facts.get("who") or ("someone" if facts.get("who") else None)
@@ -549,4 +982,61 @@ class QuizGenerator:
         return "Hints: " + ", ".join(hints) if hints else "Hints: Keep questions simple (who/what, where, how it feels)."
 
 
-__all__ = ["QuizGenerator"]
+class QuizBatcher:
+    """
+    Coalesces quiz requests that arrive within `window_s` (or until `max_batch`)
+    into one QuizGenerator.generate_many() call on a worker thread. Only the local
+    HF path is batched; OpenAI/dynamic requests go straight to generate_async().
+    """
+
+    def __init__(self, generator: QuizGenerator, window_s: float = 0.02, max_batch: int = 8):
+        self.generator = generator
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self._pending: list = []      # (caption, num_questions, image_hash, future)
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, caption: str, num_questions: int = 3, image_hash: Optional[str] = None) -> List[dict]:
+        if not self.generator.batches_locally:
+            return await self.generator.generate_async(caption, num_questions, image_hash)
+        if not (caption or "").strip():
+            raise ValueError("empty_caption")
+
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((caption, num_questions, image_hash, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_s, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: list) -> None:
+        loop = asyncio.get_running_loop()
+        groups: dict = {}
+        for item in batch:
+            groups.setdefault(item[1], []).append(item)   # one pipeline call per question count
+        for n, items in groups.items():
+            caps = [c for c, _, _, _ in items]
+            hashes = [h for _, _, h, _ in items]
+            try:
+                results = await loop.run_in_executor(None, self.generator.generate_many, caps, n, hashes)
+            except Exception as e:
+                for *_, fut in items:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for (*_, fut), res in zip(items, results):
+                if not fut.done():
+                    fut.set_result(res)
+
+
+__all__ = ["QuizGenerator", "QuizBatcher"]
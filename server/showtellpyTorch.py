@@ -5,18 +5,25 @@ Flickr8k-only captioner (PyTorch):
 - At inference, retrieves nearest images and *uses their Flickr8k captions*
 - Region-based cropping supported
 - Returns multi-sentence paragraph via simple stitching
+- Nearest-neighbour search through FAISS when installed (numpy scan otherwise)
+- Index build decodes images in DataLoader workers; Pillow-SIMD is a drop-in
+  replacement for Pillow that speeds up that JPEG decode/resize further
 
 Env/Paths:
   FLICKR8K_IMAGES_DIR  (default: server/data/Images)
   FLICKR8K_TOKENS_FILE (default: server/data/captions.txt)
-  INDEX_CACHE_PATH     (default: <model_root>/flickr8k_index.npz)
+  INDEX_CACHE_PATH     (default: <model_root>/flickr8k_index.npz; vectors are kept beside it
+                        as .npy + .names.json and memory-mapped, an existing .npz is converted)
+  INDEX_HNSW_MIN       (default: 50000; corpora this large use a FAISS HNSW graph)
 """
 
 from pathlib import Path
 from typing import Optional, Dict, List, Tuple
 from dataclasses import dataclass
+from collections import OrderedDict
+from hashlib import blake2b
 from PIL import Image
-import os, re, json, random, time, math
+import os, re, json, random, time, math, threading
 import numpy as np
 
 import torch
@@ -26,43 +33,87 @@ from tqdm import tqdm
 
 from transformers import CLIPModel, CLIPProcessor
 
+# Optional: FAISS for nearest-neighbour search (pip install faiss-cpu); numpy otherwise
+try:
+    import faiss  # type: ignore
+    _HAS_FAISS = True
+except Exception:
+    faiss = None
+    _HAS_FAISS = False
+
+# faiss-gpu: torch_utils lets index.search take CUDA tensors without a host copy
+_HAS_FAISS_GPU = _HAS_FAISS and hasattr(faiss, "StandardGpuResources")
+if _HAS_FAISS_GPU:
+    try:
+        import faiss.contrib.torch_utils  # type: ignore  # noqa: F401
+    except Exception:
+        _HAS_FAISS_GPU = False
+
+# Optional: MinHash LSH for deduping long candidate lists (pip install datasketch)
+try:
+    from datasketch import MinHash, MinHashLSH  # type: ignore
+    _HAS_DATASKETCH = True
+except Exception:
+    MinHash = MinHashLSH = None
+    _HAS_DATASKETCH = False
+
 # ---------------- text helpers ----------------
 
+_WS_RE = re.compile(r"\s+")
+_VOCAB = {
+    "automobile": "car",
+    "canine": "dog",
+    "feline": "cat",
+    "residential": "house",
+    "individual": "person",
+    "adjacent": "next to",
+    "beneath": "under",
+}
+
 def _clean_text(s: str) -> str:
     s = s.strip()
-    s = re.sub(r"\s+", " ", s)
+    s = _WS_RE.sub(" ", s)
     if s and s[-1] not in ".!?":
         s += "."
     return s
 
 def _simplify_vocab(s: str) -> str:
-    repl = {
-        "automobile": "car",
-        "canine": "dog",
-        "feline": "cat",
-        "residential": "house",
-        "individual": "person",
-        "adjacent": "next to",
-        "beneath": "under",
-    }
-    words = s.split()
-    out = []
-    for w in words:
-        lw = w.lower().strip(",.")
-        out.append(repl.get(lw, w))
-    return " ".join(out)
+    return " ".join(_VOCAB.get(w.lower().strip(",."), w) for w in s.split())
+
+# MinHash costs ~0.3 ms a line, so the exact pairwise check wins until about here
+_LSH_MIN_LINES = 1000
 
 def _dedupe_similar(lines: List[str], jacc_th: float = 0.65) -> List[str]:
-    def jac(a, b):
-        A, B = set(a.lower().split()), set(b.lower().split())
-        if not A or not B: return 0.0
-        return len(A & B) / len(A | B)
+    if _HAS_DATASKETCH and len(lines) >= _LSH_MIN_LINES:
+        return _dedupe_lsh(lines, jacc_th)
     out: List[str] = []
+    kept: List[set] = []  # token sets of `out`, built once per line
     for s in lines:
         s = s.strip()
         if not s: continue
-        if all(jac(s, t) < jacc_th for t in out):
+        A = set(s.lower().split())
+        if all(len(A & B) / len(A | B) < jacc_th for B in kept):
             out.append(s)
+            kept.append(A)
+    return out
+
+def _dedupe_lsh(lines: List[str], jacc_th: float, num_perm: int = 64) -> List[str]:
+    """_dedupe_similar in ~O(N): LSH proposes near-duplicates, exact Jaccard confirms them."""
+    lsh = MinHashLSH(threshold=jacc_th, num_perm=num_perm)
+    out: List[str] = []
+    kept: List[set] = []
+    for s in lines:
+        s = s.strip()
+        if not s: continue
+        A = set(s.lower().split())
+        m = MinHash(num_perm=num_perm)
+        for w in A:
+            m.update(w.encode("utf-8"))
+        if any(len(A & kept[int(k)]) / len(A | kept[int(k)]) >= jacc_th for k in lsh.query(m)):
+            continue
+        lsh.insert(str(len(out)), m)
+        out.append(s)
+        kept.append(A)
     return out
 
 def _fuse_to_paragraph(sentences: List[str]) -> str:
@@ -97,16 +148,16 @@ def _read_flickr8k_tokens(token_path: Path) -> Dict[str, List[str]]:
         f.seek(0)
 
         if "\t" in first:
-            # TSV reader
+            # TSV reader: one partition per field (no intermediate lists) in a single pass
+            add = caps.setdefault
             for line in f:
-                line = line.strip()
-                if not line or "\t" not in line:
+                left, tab, cap = line.strip().partition("\t")
+                if not tab:
                     continue
-                left, cap = line.split("\t", 1)
-                img = left.split("#", 1)[0].strip()
+                img = left.partition("#")[0].strip()
                 cap = cap.strip()
                 if img and cap:
-                    caps.setdefault(img, []).append(cap)
+                    add(img, []).append(cap)
             return caps
 
         # CSV reader (comma)
@@ -135,6 +186,13 @@ class _ImagePathDataset(Dataset):
         im = Image.open(p).convert("RGB")
         return self.preprocess(im), p.name
 
+class _ClipPixels:
+    """PIL -> CLIP pixel_values (3, H, W); a class (not a lambda) so worker processes can pickle it."""
+    def __init__(self, image_processor):
+        self.image_processor = image_processor
+    def __call__(self, im: Image.Image) -> torch.Tensor:
+        return self.image_processor(images=im, return_tensors="pt")["pixel_values"][0]
+
 # ---------------- main captioner ----------------
 
 @dataclass
@@ -142,6 +200,57 @@ class _Index:
     emb: np.ndarray           # (N, D) float32
     names: List[str]          # image file names aligned with emb
     caps: Dict[str, List[str]]# mapping name -> captions
+    ann: Optional[object] = None  # FAISS index over emb (None -> numpy scan)
+
+# Below this many images an exact scan is cheap; above it, an HNSW graph (~99% recall)
+HNSW_MIN_VECTORS = int(os.getenv("INDEX_HNSW_MIN", "50000"))
+
+# Neighbour ids of recently queried images/crops (retries, pagination re-send the same pixels)
+_Q_CACHE_MAX = 256
+
+def _query_key(pil: Image.Image, topk: int) -> bytes:
+    h = blake2b(pil.tobytes(), digest_size=16)
+    h.update(f"{pil.mode}:{pil.size}:{topk}".encode("ascii"))
+    return h.digest()
+
+def _build_ann(emb: np.ndarray, graph_cache: Optional[Path] = None, fresh: bool = False):
+    """
+    FAISS index over L2-normalized vectors (inner product == cosine).
+    Flat (exact) for small corpora, HNSW for large ones; the HNSW graph is costly
+    to build, so it is kept next to the .npz cache and reused while it matches.
+    Vectors are stored as fp16 (half the memory traffic per scan; unit-norm CLIP
+    vectors lose nothing measurable), queries stay float32.
+    """
+    if not _HAS_FAISS or emb.size == 0:
+        return None
+    vecs = np.ascontiguousarray(emb, dtype=np.float32)
+    fp16 = faiss.ScalarQuantizer.QT_fp16
+    if len(vecs) < HNSW_MIN_VECTORS:
+        ann = faiss.IndexScalarQuantizer(vecs.shape[1], fp16, faiss.METRIC_INNER_PRODUCT)
+        ann.train(vecs)  # no-op for fp16, but required before add
+        ann.add(vecs)
+        return ann
+
+    ann = None
+    if graph_cache is not None and graph_cache.exists() and not fresh:
+        try:
+            ann = faiss.read_index(str(graph_cache))
+            if ann.ntotal != len(vecs) or ann.d != vecs.shape[1]:
+                ann = None
+        except Exception:
+            ann = None
+    if ann is None:
+        ann = faiss.IndexHNSWSQ(vecs.shape[1], fp16, 32, faiss.METRIC_INNER_PRODUCT)
+        ann.hnsw.efConstruction = 200
+        ann.train(vecs)
+        ann.add(vecs)
+        if graph_cache is not None:
+            try:
+                faiss.write_index(ann, str(graph_cache))
+            except Exception:
+                pass
+    ann.hnsw.efSearch = 64
+    return ann
 
 class ShowTellCaptioner:
     """
@@ -159,6 +268,9 @@ class ShowTellCaptioner:
         self.images_dir = Path(os.getenv("FLICKR8K_IMAGES_DIR", "server/data/Images"))
         self.tokens_file = Path(os.getenv("FLICKR8K_TOKENS_FILE", "server/data/captions.txt"))
         self.index_cache = Path(os.getenv("INDEX_CACHE_PATH", str(self.model_root / "flickr8k_index.npz")))
+        self._emb_cache = self.index_cache.with_suffix(".npy")
+        self._names_cache = self.index_cache.with_suffix(".names.json")
+        self._graph_cache = self.index_cache.with_suffix(".hnsw")  # only written for large corpora
 
         self.ready = False
         self.err: Optional[str] = None
@@ -167,7 +279,13 @@ class ShowTellCaptioner:
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.clip: Optional[CLIPModel] = None
         self.proc: Optional[CLIPProcessor] = None
+        self._tfm = None  # query-path PIL -> uint8 (3, H, W); scaling/normalize run on self.device
+        self._px_mean: Optional[torch.Tensor] = None
+        self._px_std: Optional[torch.Tensor] = None
         self.index: Optional[_Index] = None
+        self._gpu_res = None  # faiss.StandardGpuResources, kept alive with the GPU index
+        self._q_cache: "OrderedDict[bytes, List[int]]" = OrderedDict()
+        self._q_lock = threading.Lock()
 
         self._startup()
 
@@ -182,10 +300,16 @@ class ShowTellCaptioner:
 
             # load CLIP
             self.clip = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(self.device)
+            if self.device.type == "cuda":
+                # NHWC for the patch-embedding conv (pixel_values follow in _image_features)
+                self.clip = self.clip.to(memory_format=torch.channels_last)
             self.proc = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+            self._build_pixel_transform()
+            self._compile_clip()
 
             # build / load index
             self.index = self._load_or_build_index()
+            self._move_ann_to_gpu()
             self.ready = True
             self.err = None
         except Exception as e:
@@ -197,78 +321,299 @@ class ShowTellCaptioner:
         img_paths = sorted([p for p in self.images_dir.iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png")])
         names = [p.name for p in img_paths]
 
-        if self.index_cache.exists():
-            data = np.load(self.index_cache, allow_pickle=True)
-            emb = data["emb"].astype(np.float32)
-            names_cached = data["names"].tolist()
+        cached = self._read_index_cache()
+        if cached is not None:
+            emb, names_cached = cached
             # If cache matches the current set, reuse it
             if names_cached == names:
-                return _Index(emb=emb, names=names_cached, caps=caps)
+                return _Index(emb=emb, names=names_cached, caps=caps,
+                              ann=_build_ann(emb, self._graph_cache))
 
         # build embeddings
         assert self.clip is not None and self.proc is not None
-        preprocess = self.proc.feature_extractor  # internal use by processor
-        # wrap into torchvision-like transform for dataset
-        # The CLIPProcessor will be used at batch time; here we just keep PIL
-        ds = _ImagePathDataset(img_paths, preprocess=lambda x: x)
-        dl = DataLoader(ds, batch_size=self.batch, shuffle=False, num_workers=0, collate_fn=lambda b: b)
-
-        embs: List[np.ndarray] = []
+        preprocess = getattr(self.proc, "image_processor", None) or self.proc.feature_extractor
+        # decode + resize + normalize run in DataLoader workers; the main process only
+        # receives stacked pixel tensors and ships them to the device
+        ds = _ImagePathDataset(img_paths, preprocess=_ClipPixels(preprocess))
+        workers = max(2, (os.cpu_count() or 4) // 2)
+        dl = DataLoader(ds, batch_size=self.batch, shuffle=False, num_workers=workers,
+                        pin_memory=self.device.type == "cuda", prefetch_factor=2)
+
+        # batches are written straight into the on-disk .npy (no per-batch list, no
+        # concatenate copy); it is renamed into place only once every row is filled
+        os.makedirs(self._emb_cache.parent, exist_ok=True)
+        partial = self._emb_cache.with_suffix(".partial.npy")
+        dim = self.clip.config.projection_dim
+        out = np.lib.format.open_memmap(partial, mode="w+", dtype=np.float32, shape=(len(img_paths), dim))
+        # CUDA: features come back through two pinned staging slots (non_blocking D->H);
+        # batch N-1 is written to disk while batch N is still on the GPU
+        cuda = self.device.type == "cuda"
+        stage = [torch.empty((self.batch, dim), dtype=torch.float32, pin_memory=True)
+                 for _ in range(2)] if cuda else []
+        pending = None  # (slot, event, offset, rows) of the copy in flight
+
+        def drain(p) -> None:
+            slot, done, at, rows = p
+            done.synchronize()
+            out[at:at + rows] = stage[slot][:rows].numpy()
+
+        off = 0
         self.clip.eval()
         with torch.no_grad():
-            for batch in tqdm(dl, desc="Indexing Flickr8k", total=len(dl)):
-                # batch is list of tuples: (PIL_image, name)
-                images = [im for im, _name in batch]
-                inputs = self.proc(images=images, return_tensors="pt").to(self.device)
-                img_feat = self.clip.get_image_features(**inputs)  # (B, D)
-                img_feat = torch.nn.functional.normalize(img_feat, p=2, dim=-1)
-                embs.append(img_feat.detach().cpu().numpy().astype(np.float32))
-        emb = np.concatenate(embs, axis=0)
-
-        os.makedirs(self.index_cache.parent, exist_ok=True)
-        np.savez_compressed(self.index_cache, emb=emb, names=np.array(names, dtype=object))
-        return _Index(emb=emb, names=names, caps=caps)
+            for i, pixels in enumerate(tqdm(self._prefetch_to_device(dl), desc="Indexing Flickr8k", total=len(dl))):
+                inputs = {"pixel_values": pixels}
+                img_feat = self._image_features(inputs)  # (B, D) float32
+                b = img_feat.shape[0]
+                if cuda:
+                    slot = i % 2
+                    stage[slot][:b].copy_(img_feat, non_blocking=True)
+                    done = torch.cuda.Event()
+                    done.record()
+                    if pending is not None:
+                        drain(pending)
+                    pending = (slot, done, off, b)
+                else:
+                    out[off:off + b] = img_feat.numpy()
+                off += b
+        if pending is not None:
+            drain(pending)
+        out.flush()
+        del out
+        os.replace(partial, self._emb_cache)
+        self._names_cache.write_text(json.dumps(names), encoding="utf-8")
+        emb = np.load(self._emb_cache, mmap_mode="r")
+
+        return _Index(emb=emb, names=names, caps=caps,
+                      ann=_build_ann(emb, self._graph_cache, fresh=True))
+
+    # Cache layout: raw float32 <cache>.npy (memory-mapped on load, so startup reads no
+    # vectors and forked workers share the pages) + <cache>.names.json. The old
+    # compressed <cache>.npz is still read once and converted.
+    def _read_index_cache(self) -> Optional[Tuple[np.ndarray, List[str]]]:
+        if self._emb_cache.exists() and self._names_cache.exists():
+            try:
+                emb = np.load(self._emb_cache, mmap_mode="r")
+                names = json.loads(self._names_cache.read_text(encoding="utf-8"))
+                if emb.dtype == np.float32 and emb.ndim == 2 and len(emb) == len(names):
+                    return emb, names
+            except Exception:
+                pass  # unreadable: try the legacy archive / rebuild
+        if self.index_cache.exists() and self.index_cache.suffix == ".npz":
+            try:
+                data = np.load(self.index_cache, allow_pickle=True)
+                emb = data["emb"].astype(np.float32)
+                names = data["names"].tolist()
+                self._write_index_cache(emb, names)
+                return emb, names
+            except Exception:
+                pass
+        return None
+
+    def _write_index_cache(self, emb: np.ndarray, names: List[str]) -> None:
+        os.makedirs(self._emb_cache.parent, exist_ok=True)
+        np.save(self._emb_cache, np.ascontiguousarray(emb, dtype=np.float32))
+        self._names_cache.write_text(json.dumps(names), encoding="utf-8")
+
+    def _prefetch_to_device(self, dl: DataLoader):
+        """
+        Yields each batch's pixel_values on self.device. On CUDA the host->device copy
+        of batch N+1 is issued on a side stream (pinned memory, non_blocking) while
+        batch N is being embedded.
+        """
+        if self.device.type != "cuda":
+            for pixels, _names in dl:
+                yield pixels.to(self.device)
+            return
+
+        copy_stream = torch.cuda.Stream()
+
+        def stage(pixels):
+            with torch.cuda.stream(copy_stream):
+                return pixels.to(self.device, non_blocking=True)
+
+        it = iter(dl)
+        first = next(it, None)
+        nxt = stage(first[0]) if first is not None else None
+        while nxt is not None:
+            torch.cuda.current_stream().wait_stream(copy_stream)
+            cur = nxt
+            cur.record_stream(torch.cuda.current_stream())  # allocated on copy_stream, used here
+            batch = next(it, None)
+            nxt = stage(batch[0]) if batch is not None else None
+            yield cur
+
+    def _compile_clip(self) -> None:
+        """
+        torch.compile the image tower (CUDA only; CPU compile time outweighs the gain).
+        Compilation is lazy, so one warm-up forward runs here: a failure then keeps the
+        eager model instead of surfacing on the first user query.
+        """
+        if self.device.type != "cuda" or not hasattr(torch, "compile"):
+            return
+        assert self.clip is not None and self.proc is not None
+        eager = self.clip.get_image_features
+        try:
+            # get_image_features (not forward) is what gets called, so compile the method itself
+            self.clip.get_image_features = torch.compile(eager, mode="reduce-overhead", dynamic=False)
+            with torch.no_grad():
+                self._image_features(self._pixels([Image.new("RGB", (224, 224))]))
+        except Exception:
+            self.clip.get_image_features = eager
+
+    def _build_pixel_transform(self) -> None:
+        """
+        The CLIPProcessor steps as torchvision ops, for queries: resize + center-crop stay
+        on the CPU (PIL), the 0-255 rescale and mean/std normalize run on self.device.
+        """
+        assert self.proc is not None
+        ip = getattr(self.proc, "image_processor", None) or self.proc.feature_extractor
+        size, crop = ip.size, ip.crop_size
+        # plain dicts, or SizeDict on newer transformers; both index by key
+        short = int(size) if isinstance(size, int) else size["shortest_edge"]
+        crop_hw = int(crop) if isinstance(crop, int) else (crop["height"], crop["width"])
+        self._tfm = transforms.Compose([
+            transforms.Resize(short, interpolation=transforms.InterpolationMode.BICUBIC),
+            transforms.CenterCrop(crop_hw),
+            transforms.PILToTensor(),  # uint8: a quarter of the float32 bytes to copy
+        ])
+        # in 0-255 units: (px / 255 - mean) / std == (px - 255 * mean) / (255 * std)
+        self._px_mean = torch.tensor(ip.image_mean, device=self.device).view(1, -1, 1, 1) * 255.0
+        self._px_std = torch.tensor(ip.image_std, device=self.device).view(1, -1, 1, 1) * 255.0
+
+    def _pixels(self, pils: List[Image.Image]) -> Dict[str, torch.Tensor]:
+        """CLIP inputs for PIL images, normalized on self.device (matches CLIPProcessor)."""
+        assert self._tfm is not None
+        px = torch.stack([self._tfm(im.convert("RGB")) for im in pils])
+        if self.device.type == "cuda":
+            px = px.pin_memory()
+        px = px.to(self.device, non_blocking=True).float()
+        return {"pixel_values": (px - self._px_mean) / self._px_std}
+
+    def _move_ann_to_gpu(self) -> None:
+        # Flat only: FAISS has no GPU HNSW, and the graph search is cheap on CPU anyway
+        if self.index is None or self.index.ann is None or self.device.type != "cuda" or not _HAS_FAISS_GPU:
+            return
+        if not isinstance(self.index.ann, (faiss.IndexFlat, faiss.IndexScalarQuantizer)):
+            return
+        try:
+            # the GPU cloner has no flat-SQ index; a flat index stored as fp16 is its equivalent
+            flat = faiss.IndexFlatIP(self.index.emb.shape[1])
+            flat.add(np.ascontiguousarray(self.index.emb, dtype=np.float32))
+            co = faiss.GpuClonerOptions()
+            co.useFloat16 = True
+            self._gpu_res = faiss.StandardGpuResources()
+            self.index.ann = faiss.index_cpu_to_gpu(self._gpu_res, 0, flat, co)
+        except Exception:
+            self._gpu_res = None  # stay on the CPU index
 
     # ---------- internal utils ----------
 
+    def _image_features(self, inputs) -> torch.Tensor:
+        """L2-normalized CLIP image features, always float32 (B, D)."""
+        assert self.clip is not None
+        if self.device.type != "cuda":
+            feat = self.clip.get_image_features(**inputs)
+        else:
+            inputs["pixel_values"] = inputs["pixel_values"].to(memory_format=torch.channels_last)
+            # half-precision matmuls on tensor cores; stored/compared embeddings stay fp32
+            half = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+            with torch.autocast(device_type="cuda", dtype=half):
+                feat = self.clip.get_image_features(**inputs)
+        return torch.nn.functional.normalize(feat.float(), p=2, dim=-1)
+
     def _embed(self, pil: Image.Image) -> np.ndarray:
-        assert self.clip is not None and self.proc is not None
+        assert self.clip is not None
         self.clip.eval()
         with torch.no_grad():
-            inputs = self.proc(images=pil, return_tensors="pt").to(self.device)
-            feat = self.clip.get_image_features(**inputs)
-            feat = torch.nn.functional.normalize(feat, p=2, dim=-1)
+            feat = self._image_features(self._pixels([pil]))
         return feat.detach().cpu().numpy().astype(np.float32)[0]  # (D,)
 
-    def _nearest(self, q: np.ndarray, topk: int) -> List[int]:
+    def _query_batch(self, pils: List[Image.Image]):
+        """
+        Query embeddings for several images in ONE CLIP forward: a (B, D) CUDA tensor
+        when the index is on the GPU, else numpy (B, D).
+        """
+        assert self.clip is not None
+        with torch.no_grad():
+            feat = self._image_features(self._pixels(pils))
+        if self._gpu_res is not None:
+            return feat.contiguous()
+        return feat.detach().cpu().numpy().astype(np.float32)
+
+    def _nearest_batch(self, qs, topk: int) -> List[List[int]]:
+        """Top-k neighbour ids for each row of a (B, D) query matrix, in one search."""
         assert self.index is not None
+        if self.index.ann is not None:
+            if isinstance(qs, torch.Tensor):
+                _, ids = self.index.ann.search(qs, topk)  # stays on the device
+            else:
+                _, ids = self.index.ann.search(np.ascontiguousarray(qs, dtype=np.float32), topk)
+            return [[i for i in row if i >= 0] for row in ids.tolist()]  # -1 pads when topk > N
+        if isinstance(qs, torch.Tensor):
+            qs = qs.detach().cpu().numpy()
         # cosine sim since all vectors are L2-normalized
-        sims = self.index.emb @ q  # (N,)
-        idx = np.argpartition(-sims, kth=min(topk, len(sims)-1))[:topk]
-        return idx[np.argsort(-sims[idx])].tolist()
+        sims = self.index.emb @ qs.T  # (N, B)
+        kth = min(topk, len(sims) - 1)
+        out: List[List[int]] = []
+        for col in sims.T:
+            idx = np.argpartition(-col, kth=kth)[:topk]
+            out.append(idx[np.argsort(-col[idx])].tolist())
+        return out
+
+    def _nearest_cached(self, pils: List[Image.Image], topk: int) -> List[List[int]]:
+        """
+        _nearest_batch(_query_batch(pils)) through a small LRU keyed on the pixels:
+        hits skip the CLIP forward and the search, misses still go in one batch.
+        """
+        keys = [_query_key(p, topk) for p in pils]
+        out: List[Optional[List[int]]] = [None] * len(pils)
+        with self._q_lock:
+            for i, k in enumerate(keys):
+                hit = self._q_cache.get(k)
+                if hit is not None:
+                    self._q_cache.move_to_end(k)
+                    out[i] = hit
+        miss = [i for i, top in enumerate(out) if top is None]
+        if miss:
+            tops = self._nearest_batch(self._query_batch([pils[i] for i in miss]), topk)
+            with self._q_lock:
+                for i, top in zip(miss, tops):
+                    out[i] = top
+                    self._q_cache[keys[i]] = top
+                while len(self._q_cache) > _Q_CACHE_MAX:
+                    self._q_cache.popitem(last=False)  # evict least recently used
+        return out  # type: ignore[return-value]
+
+    def _nearest(self, q, topk: int) -> List[int]:
+        return self._nearest_batch(q.reshape(1, -1), topk)[0]
+
+    @staticmethod
+    def _crop(image: Image.Image, region: Optional[Dict[str, int]]) -> Image.Image:
+        if not region:
+            return image
+        try:
+            x = max(0, int(region.get("x", 0))); y = max(0, int(region.get("y", 0)))
+            w = max(1, int(region.get("w", 1))); h = max(1, int(region.get("h", 1)))
+            return image.crop((x, y, x + w, y + h))
+        except Exception:
+            return image
 
     def _pick_captions(self, neighbor_names: List[str], max_caps: int = 5) -> List[str]:
         assert self.index is not None
         caps_out: List[str] = []
         for name in neighbor_names:
             caps = self.index.caps.get(name, [])
-            # keep 1–2 per neighbour to avoid repetition
-            random.shuffle(caps)
-            for c in caps[:2]:
+            # keep 1–2 per neighbour to avoid repetition (sample: caps is the cached list, don't shuffle it)
+            for c in random.sample(caps, k=min(2, len(caps))):
                 caps_out.append(_clean_text(c))
                 if len(caps_out) >= max_caps:
                     break
             if len(caps_out) >= max_caps:
                 break
-        # dedupe and lightly shorten
+        # dedupe and lightly shorten (caps are _clean_text'ed: single spaces, so words == spaces + 1)
         caps_out = _dedupe_similar(caps_out)
-        short = []
-        for s in caps_out:
-            words = s.split()
-            if len(words) > 18:
-                s = " ".join(words[:18]) + "..."
-            short.append(_simplify_vocab(s))
-        return short
+        return [_simplify_vocab(s if s.count(" ") < 18 else " ".join(s.split(None, 18)[:18]) + "...")
+                for s in caps_out]
 
     # ---------- public API ----------
 
@@ -277,23 +622,30 @@ class ShowTellCaptioner:
         Returns a single sentence *from Flickr8k* by retrieving the most similar image
         and taking one of its reference captions.
         """
+        return self.caption_batch([image], [region])[0]
+
+    def caption_batch(
+        self,
+        images: List[Image.Image],
+        regions: Optional[List[Optional[Dict[str, int]]]] = None,
+    ) -> List[str]:
+        """
+        caption() for several images/crops at once: one batched CLIP forward and one
+        neighbour search for the lot. regions[i] (optional) crops images[i].
+        """
         if not self.ready or self.index is None:
             raise RuntimeError(self.err or "captioner unavailable")
-
-        pil = image
-        if region:
-            try:
-                x = max(0, int(region.get("x", 0))); y = max(0, int(region.get("y", 0)))
-                w = max(1, int(region.get("w", 1))); h = max(1, int(region.get("h", 1)))
-                pil = image.crop((x, y, x + w, y + h))
-            except Exception:
-                pil = image
-
-        q = self._embed(pil)
-        top = self._nearest(q, topk=max(1, self.k))
-        nn_names = [self.index.names[i] for i in top]  # type: ignore
-        caps = self._pick_captions(nn_names, max_caps=1)
-        return caps[0] if caps else ""
+        if not images:
+            return []
+
+        regions = list(regions or [None] * len(images))
+        pils = [self._crop(im, r) for im, r in zip(images, regions)]
+        tops = self._nearest_cached(pils, topk=max(1, self.k))
+        out: List[str] = []
+        for top in tops:
+            caps = self._pick_captions([self.index.names[i] for i in top], max_caps=1)
+            out.append(caps[0] if caps else "")
+        return out
 
     def describe(
         self,
@@ -308,18 +660,12 @@ class ShowTellCaptioner:
         if not self.ready or self.index is None:
             raise RuntimeError(self.err or "captioner unavailable")
 
-        pil = image
-        if region:
-            try:
-                x = max(0, int(region.get("x", 0))); y = max(0, int(region.get("y", 0)))
-                w = max(1, int(region.get("w", 1))); h = max(1, int(region.get("h", 1)))
-                pil = image.crop((x, y, x + w, y + h))
-            except Exception:
-                pil = image
-
-        q = self._embed(pil)
-        top = self._nearest(q, topk=max(3, self.k))
-        nn_names = [self.index.names[i] for i in top]  # type: ignore
+        pil = self._crop(image, region)
+        # With a region, the full image rides along in the same forward/search so its
+        # neighbours can back up a crop whose neighbours have no usable captions.
+        batch = [pil, image] if pil is not image else [pil]
+        tops = self._nearest_cached(batch, topk=max(3, self.k))
+        nn_names = [self.index.names[i] for i in tops[0]]  # type: ignore
 
         # collect a few captions from the nearest images
         # cap count guided by n_candidates
@@ -327,8 +673,9 @@ class ShowTellCaptioner:
         sents = self._pick_captions(nn_names, max_caps=want)
 
         if not sents:
-            # fallback: one nearest caption
-            sents = [self.caption(pil)]
+            # fallback: one caption from the whole picture's neighbours (or the crop's again)
+            fb_names = [self.index.names[i] for i in tops[-1][:max(1, self.k)]]  # type: ignore
+            sents = (self._pick_captions(fb_names, max_caps=1) or [""])[:1]
 
         para = _fuse_to_paragraph(sents) if mode == "paragraph" else ""
         return sents, para
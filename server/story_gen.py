@@ -1,7 +1,8 @@
 ﻿# server/story_gen.py  — ultra-minimal multimodal story generator (GPT-4o mini)
 from __future__ import annotations
-import base64, io, os, json, re
-from typing import List, Tuple, Optional
+import base64, io, os, json, re, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple, Optional
 from PIL import Image
 
 # OpenAI >= 1.0.0
@@ -11,13 +12,31 @@ except Exception as e:
     raise RuntimeError("Please `pip install openai>=1.0.0`") from e
 
 
-def _data_url_from_pil(img: Image.Image, fmt: str = "PNG") -> str:
-    """Convert a PIL Image to a data URL (base64 PNG by default)."""
-    buf = io.BytesIO()
-    img.save(buf, format=fmt)
-    b64 = base64.b64encode(buf.getvalue()).decode("ascii")
-    mime = "image/png" if fmt.upper() == "PNG" else "image/jpeg"
-    return f"data:{mime};base64,{b64}"
+_MIME = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# One encode buffer per thread, reused across calls (BytesIO isn't thread-safe); the
+# encode pool below is long-lived so its workers keep theirs between requests.
+_TLS = threading.local()
+_ENCODE_POOL = ThreadPoolExecutor(max_workers=3, thread_name_prefix="story-encode")
+
+def _data_url_from_pil(img: Image.Image, fmt: str = "JPEG", quality: int = 85) -> str:
+    """
+    Convert a PIL Image to a data URL (base64 JPEG q85 by default: several times
+    faster to encode than PNG and far fewer bytes to upload for photos).
+    """
+    fmt = "JPEG" if fmt.upper() == "JPG" else fmt.upper()
+    if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")  # JPEG has no alpha
+    opts = {"quality": quality, "optimize": False} if fmt in ("JPEG", "WEBP") else {}
+    buf = getattr(_TLS, "buf", None)
+    if buf is None:
+        buf = _TLS.buf = io.BytesIO()
+    buf.seek(0)
+    buf.truncate()
+    img.save(buf, format=fmt, **opts)
+    with buf.getbuffer() as raw:  # no getvalue() copy; released before the next truncate
+        b64 = base64.b64encode(raw).decode("ascii")
+    return f"data:{_MIME.get(fmt, 'image/jpeg')};base64,{b64}"
 
 
 def _parse_json_like(s: str) -> Tuple[str, List[str], str]:
@@ -58,6 +77,28 @@ def _parse_json_like(s: str) -> Tuple[str, List[str], str]:
     return title, panels, moral
 
 
+_PANELS_KEY_RE = re.compile(r'"panels"\s*:\s*\[')
+_JSON = json.JSONDecoder()
+
+def _complete_panels(buf: str) -> List[str]:
+    """Panel strings already closed in a partial JSON reply (the "panels" array so far)."""
+    m = _PANELS_KEY_RE.search(buf)
+    if not m:
+        return []
+    out: List[str] = []
+    pos = m.end()
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf) or buf[pos] != '"':
+            return out
+        try:
+            val, pos = _JSON.raw_decode(buf, pos)
+        except ValueError:
+            return out  # string still streaming in
+        out.append(str(val).strip())
+
+
 class StoryGenerator:
     """
     Minimal API:
@@ -89,10 +130,23 @@ class StoryGenerator:
         images: list of exactly 3 PIL Images (panel1, panel2, panel3)
         returns: (title, [panel1, panel2, panel3], moral)
         """
+        for ev in self.stream_from_images(images, mood=mood):
+            if ev["type"] == "done":
+                return ev["title"], ev["panels"], ev["moral"]
+        raise RuntimeError("story stream ended without a result")
+
+    def stream_from_images(self, images: List[Image.Image], mood: str = "friendly") -> Iterator[Dict]:
+        """
+        Streaming generate_from_images. Yields
+          {"type": "panel", "index": i, "text": str}   as each panel finishes, then
+          {"type": "done", "title": str, "panels": [3 str], "moral": str}
+        so a caller can show Panel 1 while Panel 3 is still being written.
+        """
         if not images or len(images) != 3:
             raise ValueError("Exactly three images are required")
 
-        data_urls = [_data_url_from_pil(img, "PNG") for img in images]
+        # PIL releases the GIL while encoding, so the three panels encode in parallel
+        data_urls = list(_ENCODE_POOL.map(_data_url_from_pil, images))
 
         system_msg = (
             "You are a children's storyteller. "
@@ -114,7 +168,7 @@ class StoryGenerator:
             )},
         ]
 
-        resp = self.client.chat.completions.create(
+        stream = self.client.chat.completions.create(
             model=self.model,
             temperature=0.6,
             max_tokens=400,
@@ -122,14 +176,41 @@ class StoryGenerator:
                 {"role": "system", "content": system_msg},
                 {"role": "user", "content": user_content},
             ],
+            stream=True,
         )
 
-        text = (resp.choices[0].message.content or "").strip()
+        chunks: List[str] = []
+        sent = 0
+        try:
+            for event in stream:
+                tok = (event.choices[0].delta.content or "") if event.choices else ""
+                if not tok:
+                    continue
+                chunks.append(tok)
+                buf = "".join(chunks)
+                done = sent < 3 and _complete_panels(buf)
+                for text in (done or [])[sent:3]:
+                    yield {"type": "panel", "index": sent, "text": text}
+                    sent += 1
+                if "}" in tok:
+                    try:
+                        json.loads(buf.strip())
+                        break  # whole object arrived; don't wait for trailing tokens
+                    except ValueError:
+                        pass
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+
+        text = "".join(chunks).strip()
         title, panels, moral = _parse_json_like(text)
 
         # minimal sanity: ensure 3 strings
         panels = [(panels[i] if i < len(panels) and isinstance(panels[i], str) else "").strip() for i in range(3)]
-        return title.strip(), panels, moral.strip()
+        for i in range(sent, 3):  # non-JSON replies only parse at the end
+            yield {"type": "panel", "index": i, "text": panels[i]}
+        yield {"type": "done", "title": title.strip(), "panels": panels, "moral": moral.strip()}
 
     # --- Compatibility layer with main.py ---
     def build_scenes(self, images: List[Image.Image], labels: List[List[str]]):
@@ -528,15 +528,34 @@ async function apiStoryDelete(id){
   return d; // { ok: true }
 }
 
-async function apiStory(blobs){
+// Streams Server-Sent Events from /api/story/stream: onPanel(i, text) fires as
+// each panel is written; resolves with the final /api/story-shaped payload.
+async function apiStory(blobs, onPanel){
   const fd = new FormData();
   fd.append('image1', blobs[0], 'scene1.png');
   fd.append('image2', blobs[1], 'scene2.png');
   fd.append('image3', blobs[2], 'scene3.png');
-  const r = await fetch(`${API}/api/story`, { method:'POST', body: fd });
-  const data = await r.json().catch(()=>({}));
-  if(!r.ok || data?.error) throw new Error(data?.error || 'story failed');
-  return data;
+  const r = await fetch(`${API}/api/story/stream`, { method:'POST', body: fd });
+  if(!r.ok || !r.body) throw new Error('story failed');
+  const reader = r.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = '';
+  for(;;){
+    const { value, done } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+    let cut;
+    while ((cut = buf.indexOf('\n\n')) >= 0) {
+      const frame = buf.slice(0, cut);
+      buf = buf.slice(cut + 2);
+      if (!frame.startsWith('data: ')) continue;
+      const ev = JSON.parse(frame.slice(6));
+      if (ev.type === 'panel') onPanel?.(ev.index, ev.text);
+      else if (ev.type === 'done') return ev;
+      else if (ev.type === 'error') throw new Error(ev.error || 'story failed');
+    }
+  }
+  throw new Error('story failed');
 }
 
 
@@ -1662,7 +1681,9 @@ function StoryPage(){
       try {
         setLoading(true);
         // Keep current images visible—do NOT clear them while generating
-        const data = await apiStory(blobs); // -> { title, panels, images? }
+        const data = await apiStory(blobs, (i, text) => {
+          if (alive) setPanels(prev => { const next = [...prev]; next[i] = text; return next; });
+        }); // -> { title, panels, images? }
         if (!alive) return;
 
         setTitle(data.title || "STORY TIME!");
@@ -1939,7 +1960,7 @@ async function saveStoryAsImage(){
                 </div>
 
                 <div className="story-comic-text">
-                  {loading ? (
+                  {loading && !panels[i] ? (
                     "Generating..."
                   ) : editing ? (
                     <textarea